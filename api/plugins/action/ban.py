@@ -0,0 +1,109 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+
+from ansible.plugins.action import ActionBase
+from ansible.utils.display import Display
+from ansible_collections.section.api.plugins.module_utils.bans import ban_environments
+from ansible_collections.section.api.plugins.module_utils.proxy_client import ProxyClient as ApiClient
+
+display = Display()
+
+
+class ActionModule(ActionBase):
+
+    _supports_check_mode = True
+
+    def run(self, tmp=None, task_vars=None):
+        """Ban objects from environment proxy caches from the controller.
+
+        This runs the section.api.ban module's logic in the controller
+        process, so no module payload is transferred or executed per task.
+        Environments are banned in parallel. In check mode the bans that
+        would be submitted are returned without calling the API.
+
+        Parameters
+        ----------
+        environment : str|list
+            The environment name or names, also accepted as environments
+        expression : str|list
+            The ban expression or expressions, eg. req.url ~ /, also accepted as expressions
+        proxy : str, optional
+            The proxy to send the ban to, defaults to varnish
+        wait : bool, optional
+            Poll the proxy state until every edge node has cleared the ban
+        timeout : int, optional
+            How many seconds to wait for edge nodes, defaults to 300
+        max_concurrency : int, optional
+            The maximum number of environments banned in parallel, defaults to 4
+
+        Raises
+        ----------
+        AnsibleError
+            Raised when parameters are missing or API request fails
+
+        Environment
+        ----------
+        section_username : str
+            The account name to authenticate with the API
+        section_password : str
+            The password (or token) to authenticate with the API
+        section_account : str
+            The section account id
+        section_application : str
+            The section application id
+        """
+
+        if task_vars is None:
+            task_vars = dict()
+
+        result = super(ActionModule, self).run(tmp, task_vars)
+
+        validation, args = self.validate_argument_spec(argument_spec=dict(
+            section_username=dict(type='str'),
+            section_password=dict(type='str', no_log=True),
+            section_account=dict(type='int', aliases=['account']),
+            section_application=dict(type='int', aliases=['application']),
+            headers=dict(type='dict', default={}),
+            environment=dict(type='list', elements='str', required=True, aliases=['environments']),
+            expression=dict(type='list', elements='str', required=True, aliases=['expressions']),
+            proxy=dict(type='str', default='varnish'),
+            wait=dict(type='bool', default=False),
+            timeout=dict(type='int', default=300),
+            max_concurrency=dict(type='int', default=4),
+        ))
+
+        environments = args['environment']
+        expressions = args['expression']
+
+        if self._task.check_mode:
+            result['changed'] = True
+            result['result'] = [{'environment': name, 'expressions': list(expressions)} for name in environments]
+            display.vv('Check result for section.api.ban: %d environments' % len(environments))
+            return result
+
+        client = ApiClient(
+            args.get('section_account') or task_vars.get('section_account'),
+            args.get('section_application') or task_vars.get('section_application'),
+            args.get('section_username') or task_vars.get('section_username'),
+            args.get('section_password') or task_vars.get('section_password'),
+            {'headers': args['headers']}
+        )
+
+        result['result'] = ban_environments(
+            client,
+            environments,
+            expressions,
+            proxy=args['proxy'],
+            wait=args['wait'],
+            timeout=args['timeout'],
+            max_concurrency=args['max_concurrency'],
+        )
+        result['changed'] = True
+
+        pending = [ban['environment'] for ban in result['result'] if ban.get('pending')]
+        if pending:
+            result['failed'] = True
+            result['msg'] = 'Timed out waiting for edge nodes to clear the ban on: %s' % ', '.join(pending)
+
+        return result
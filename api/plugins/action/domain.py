@@ -0,0 +1,138 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+
+from ansible.plugins.action import ActionBase
+from ansible.utils.display import Display
+from ansible_collections.section.api.plugins.module_utils.domains import apply_domains, domain_diff, domain_names, domain_result, plan_domains
+from ansible_collections.section.api.plugins.module_utils.env_client import EnvClient as ApiClient
+from ansible_collections.section.api.plugins.module_utils.prefetch import mark_stale, prefetched
+
+display = Display()
+
+
+class ActionModule(ActionBase):
+
+    _supports_check_mode = True
+
+    def run(self, tmp=None, task_vars=None):
+        """Manage the domains of an environment from the controller.
+
+        This runs the section.api.domain module's logic in the controller
+        process, so no module payload is transferred or executed per task.
+
+        Parameters
+        ----------
+        environment : str
+            The environment name
+        hostname : str, optional
+            The hostname to add or remove
+        hostnames : list, optional
+            A list of hostnames to add or remove
+        exclusive : bool, optional
+            Remove existing domains that are not listed in hostnames
+        state : str, optional
+            present or absent, defaults to present
+        max_concurrency : int, optional
+            The maximum number of domain requests in flight
+        refresh : bool, optional
+            Fetch the environment even when the inventory added its domains hostvar
+        rate_limits : dict, optional
+            rate and burst per endpoint class (read, write or ban), requests
+            are not throttled by default
+        retries : int, optional
+            The number of times a transient failure is retried, defaults to 5
+
+        Raises
+        ----------
+        AnsibleError
+            Raised when parameters are missing or API request fails
+
+        Environment
+        ----------
+        section_username : str
+            The account name to authenticate with the API
+        section_password : str
+            The password (or token) to authenticate with the API
+        section_account : str
+            The section account id
+        section_application : str
+            The section application id
+        """
+
+        if task_vars is None:
+            task_vars = dict()
+
+        result = super(ActionModule, self).run(tmp, task_vars)
+
+        validation, args = self.validate_argument_spec(
+            argument_spec=dict(
+                section_username=dict(type='str'),
+                section_password=dict(type='str', no_log=True),
+                section_account=dict(type='int', aliases=['account']),
+                section_application=dict(type='int', aliases=['application']),
+                headers=dict(type='dict', default={}),
+                environment=dict(type='str', required=True),
+                hostname=dict(type='str'),
+                hostnames=dict(type='list', elements='str'),
+                exclusive=dict(type='bool', default=False),
+                max_concurrency=dict(type='int', default=4),
+                public_key=dict(type='str'),
+                private_key=dict(type='str', no_log=True),
+                state=dict(type='str', default='present', choices=['absent', 'present']),
+                refresh=dict(type='bool', default=False),
+                rate_limits=dict(type='dict'),
+                retries=dict(type='int'),
+            ),
+            mutually_exclusive=[('hostname', 'hostnames')],
+            required_one_of=[('hostname', 'hostnames')],
+        )
+
+        environment_name = args['environment']
+        hostname = args['hostname']
+        hostnames = args['hostnames']
+        state = args['state']
+
+        account = args.get('section_account') or task_vars.get('section_account')
+        application = args.get('section_application') or task_vars.get('section_application')
+
+        client = ApiClient(
+            account,
+            application,
+            args.get('section_username') or task_vars.get('section_username'),
+            args.get('section_password') or task_vars.get('section_password'),
+            {
+                'headers': args['headers'],
+                'rate_limits': args['rate_limits'],
+                'retries': args['retries'],
+            }
+        )
+
+        # The domains hostvar of this host's environment, when the inventory prefetched it on this run.
+        known = None if args['refresh'] else prefetched(task_vars, 'domains', account, application, environment_name)
+
+        if known is None:
+            existing = domain_names(client.get(environment_name))
+        else:
+            existing = set(known)
+
+        plan = plan_domains(existing, [hostname] if hostname else hostnames, state, args['exclusive'])
+
+        result['changed'] = bool(plan['add'] or plan['remove'])
+        result['plan'] = plan
+        result['diff'] = domain_diff(existing, plan)
+
+        if self._task.check_mode:
+            result['result'] = domain_result(plan, hostname, state)
+            display.vv('Check result for section.api.domain: %s' % result['result'])
+            return result
+
+        applied = apply_domains(client, environment_name, plan, args['max_concurrency'])
+
+        # The domains hostvar is stale now, later tasks on this host fetch the environment again.
+        if known is not None and result['changed']:
+            result['ansible_facts'] = mark_stale(task_vars, 'domains')
+
+        result['result'] = domain_result(plan, hostname, state, applied)
+
+        return result
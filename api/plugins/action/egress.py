@@ -2,10 +2,11 @@ from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
 
-from ansible.errors import AnsibleError
 from ansible.plugins.action import ActionBase
 from ansible.utils.display import Display
+from ansible_collections.section.api.plugins.module_utils.egress import reconcile_egress
 from ansible_collections.section.api.plugins.module_utils.env_client import EnvClient as ApiClient
+from ansible_collections.section.api.plugins.module_utils.prefetch import mark_stale, prefetched
 
 display = Display()
 
@@ -21,10 +22,30 @@ EXAMPLES = r'''
     remove_headers:
       - section-io-id
       - x-my-request-location
+- name: Repoint the origins of several environments at once
+  section.api.egress:
+    environments:
+      Develop: develop-origin.com
+      feature-a:
+        origins:
+          default: feature-a-origin.com
+          assets: assets-origin.com
+        remove_headers:
+          - section-io-id
+    max_concurrency: 8
+- name: Set each inventory host's egress, comparing against the prefetched egress hostvar
+  section.api.egress:
+    environment: "{{ branch }}"
+    egress: "{{ branch }}-origin.com"
+  vars:
+    section_account: "{{ section_id }}"
+    section_application: "{{ id }}"
 '''
 
 class ActionModule(ActionBase):
 
+    _supports_check_mode = True
+
     def run(self, tmp=None, task_vars=None):
         """Update the egress of an environment.
 
@@ -36,11 +57,25 @@ class ActionModule(ActionBase):
             The environment name
         egress : str
             The egress host name to set
+        environments : dict, optional
+            Reconcile many environments instead of one. Maps each environment
+            name to an egress host name for the default origin, or to a dict
+            with an origins mapping of egress name to host name and an
+            optional remove_headers list. Origins that are not named are kept
+        max_concurrency : int, optional
+            The maximum number of requests in flight with environments
         egress_name : str, optional
             The name of the egress object in Section
         remover_headers : list, optional
             A list of optional request headers to remove when handling requests, if omitted section-io-id
             will be added for compatibility
+        refresh : bool, optional
+            Fetch the current egress even when the inventory prefetched it into the egress hostvar
+        rate_limits : dict, optional
+            rate and burst per endpoint class (read, write or ban), requests
+            are not throttled by default
+        retries : int, optional
+            The number of times a transient failure is retried, defaults to 5
 
         Raises
         ----------
@@ -64,41 +99,91 @@ class ActionModule(ActionBase):
 
         result = super(ActionModule, self).run(tmp, task_vars)
 
-        environment_name = self._task.args.get('environment')
-        egress = self._task.args.get('egress')
-        remove_headers = self._task.args.get('remove_headers')
-        egress_name = self._task.args.get('egress_name')
-
-        if not environment_name:
-            raise AnsibleError("Required parameter 'environment' is missing")
-
-        if not egress:
-            raise AnsibleError("Required parameter 'egress' is missing")
-
-        if not remove_headers:
-            remove_headers = ['section-io-id']
+        validation, args = self.validate_argument_spec(
+            argument_spec=dict(
+                environment=dict(type='str'),
+                egress=dict(type='str'),
+                environments=dict(type='dict'),
+                max_concurrency=dict(type='int', default=4),
+                egress_name=dict(type='str', default='default'),
+                remove_headers=dict(type='list', elements='str'),
+                refresh=dict(type='bool', default=False),
+                rate_limits=dict(type='dict'),
+                retries=dict(type='int'),
+            ),
+            mutually_exclusive=[('environment', 'environments')],
+            required_one_of=[('environment', 'environments')],
+            required_by={'environment': ['egress']},
+        )
 
-        if not isinstance(remove_headers, list):
-            remove_headers = [remove_headers]
+        account = task_vars.get('section_account')
+        application = task_vars.get('section_application')
 
-        if not egress_name:
-            egress_name = 'default'
+        # The egress hostvar of this host's environment, when the inventory prefetched it on this run.
+        known = {}
+        if not args['refresh']:
+            for name in ([args['environment']] if args['environment'] else list(args['environments'])):
+                current = prefetched(task_vars, 'egress', account, application, name)
+                if current is not None:
+                    known[name] = current
 
         client = ApiClient(
-            task_vars.get('section_account'),
-            task_vars.get('section_application'),
+            account,
+            application,
             task_vars.get('section_username'),
             task_vars.get('section_password'),
-            {'headers': {}}
+            {
+                'headers': {},
+                'rate_limits': args['rate_limits'],
+                'retries': args['retries'],
+            }
         )
 
-        egress_config = client.list_egress(environment_name)
+        if args['environments']:
+            result.update(self.reconcile(client, args, known))
+        else:
+            result.update(self.update(client, args, known))
 
-        if set(remove_headers) == set(egress_config['remove_request_headers']) and egress_config['origins'][egress_name]['address'] == egress:
-            result['skipped'] = True
-            return result
+        # The egress hostvar is stale now, later tasks on this host fetch the egress again.
+        if known and result.get('changed') and not self._task.check_mode:
+            result['ansible_facts'] = mark_stale(task_vars, 'egress')
+
+        return result
 
-        client.update_egress(environment_name, egress, egress_name=egress_name, remove_headers=remove_headers)
-        result['changed'] = True
+    def reconcile(self, client, args, known):
+        """Reconcile the egress of every environment in the environments arg."""
+
+        summary = reconcile_egress(
+            client,
+            args['environments'],
+            max_concurrency=args['max_concurrency'],
+            check_mode=self._task.check_mode,
+            remove_headers=args['remove_headers'],
+            known=known
+        )
+
+        result = {
+            'environments': summary,
+            'changed': any(environment['changed'] for environment in summary.values()),
+        }
+
+        if not result['changed']:
+            result['skipped'] = True
 
         return result
+
+    def update(self, client, args, known):
+        """Set one origin of the environment arg, keeping the origins it does not name."""
+
+        name = args['environment']
+        spec = {
+            'origins': {args['egress_name']: args['egress']},
+            'remove_headers': args['remove_headers'] or ['section-io-id'],
+        }
+
+        summary = reconcile_egress(client, {name: spec}, check_mode=self._task.check_mode, known=known)
+
+        if not summary[name]['changed']:
+            return {'skipped': True}
+
+        return {'changed': True}
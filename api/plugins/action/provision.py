@@ -0,0 +1,149 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+
+from ansible.errors import AnsibleError
+from ansible.plugins.action import ActionBase
+from ansible.utils.display import Display
+from ansible_collections.section.api.plugins.module_utils.env_client import EnvClient as ApiClient
+from ansible_collections.section.api.plugins.module_utils.provision import provision_environments
+
+display = Display()
+
+EXAMPLES = r'''
+- name: Create preview environments from Production and wait until they are usable
+  section.api.provision:
+    source: Production
+    environments:
+      pr-101: pr-101.preview.example.com
+      pr-102: pr-102.preview.example.com
+    max_concurrency: 8
+- name: Create an environment per branch, naming the domains after them
+  section.api.provision:
+    source: Production
+    environments: "{{ release_branches }}"
+    domain: "{name}.preview.example.com"
+    timeout: 600
+  register: provisioned
+'''
+
+
+class ActionModule(ActionBase):
+
+    _supports_check_mode = True
+
+    def run(self, tmp=None, task_vars=None):
+        """Create environments from a source environment in parallel.
+
+        Environments that already exist are skipped, the others are created
+        concurrently and polled until they are usable.
+
+        Parameters
+        ----------
+        source : str
+            The environment to copy
+        environments : dict|list
+            The domain of each environment to create keyed by name, or a list
+            of names when domain is given
+        domain : str, optional
+            The domain of each environment in a list, {name} is replaced with
+            the environment name
+        wait : bool, optional
+            Poll until every created environment is usable, defaults to true
+        timeout : int, optional
+            How many seconds to wait for the environments, defaults to 300
+        max_concurrency : int, optional
+            The maximum number of environments created in parallel, defaults to 4
+        rate_limits : dict, optional
+            rate and burst per endpoint class (read, write or ban), requests
+            are not throttled by default
+        retries : int, optional
+            The number of times a transient failure is retried, defaults to 5
+
+        Raises
+        ----------
+        AnsibleError
+            Raised when parameters are missing or API request fails
+
+        Environment
+        ----------
+        section_username : str
+            The account name to authenticate with the API
+        section_password : str
+            The password (or token) to authenticate with the API
+        section_account : str
+            The section account id
+        section_application : str
+            The section application id
+        """
+
+        if task_vars is None:
+            task_vars = dict()
+
+        result = super(ActionModule, self).run(tmp, task_vars)
+
+        validation, args = self.validate_argument_spec(
+            argument_spec=dict(
+                section_username=dict(type='str'),
+                section_password=dict(type='str', no_log=True),
+                section_account=dict(type='int', aliases=['account']),
+                section_application=dict(type='int', aliases=['application']),
+                headers=dict(type='dict', default={}),
+                source=dict(type='str', required=True),
+                environments=dict(type='raw', required=True),
+                domain=dict(type='str'),
+                wait=dict(type='bool', default=True),
+                timeout=dict(type='int', default=300),
+                max_concurrency=dict(type='int', default=4),
+                rate_limits=dict(type='dict'),
+                retries=dict(type='int'),
+            ),
+        )
+
+        environments = args['environments']
+        domain = args['domain']
+
+        if not environments:
+            raise AnsibleError("Required parameter 'environments' is missing")
+
+        if not isinstance(environments, dict):
+            if not domain:
+                raise AnsibleError("Parameter 'domain' is required when 'environments' is a list")
+
+            if not isinstance(environments, list):
+                environments = [environments]
+
+            environments = dict((name, domain.replace('{name}', name)) for name in environments)
+
+        max_concurrency = args['max_concurrency']
+
+        client = ApiClient(
+            args.get('section_account') or task_vars.get('section_account'),
+            args.get('section_application') or task_vars.get('section_application'),
+            args.get('section_username') or task_vars.get('section_username'),
+            args.get('section_password') or task_vars.get('section_password'),
+            {
+                'headers': args['headers'],
+                'pool_size': max_concurrency,
+                'rate_limits': args['rate_limits'],
+                'retries': args['retries'],
+            }
+        )
+
+        result['environments'] = provision_environments(
+            client,
+            environments,
+            args['source'],
+            wait=args['wait'],
+            timeout=args['timeout'],
+            max_concurrency=max_concurrency,
+            check_mode=self._task.check_mode,
+        )
+        result['changed'] = any(environment['changed'] for environment in result['environments'].values())
+
+        pending = [name for name, environment in result['environments'].items() if environment.get('ready') is False]
+        if pending:
+            result['failed'] = True
+            result['msg'] = 'Timed out waiting for environments to become usable: %s' % ', '.join(pending)
+
+        return result
@@ -0,0 +1,146 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+
+from ansible.plugins.action import ActionBase
+from ansible.utils.display import Display
+from ansible_collections.section.api.plugins.module_utils.env_client import EnvClient as ApiClient
+from ansible_collections.section.api.plugins.module_utils.state import apply_plan, normalise_state, plan_state, snapshot_state
+
+display = Display()
+
+EXAMPLES = r'''
+- name: Converge an application's environments, domains and egress
+  section.api.state:
+    exclusive: true
+    environments:
+      Production:
+        domains:
+          - www.example.com
+          - example.com
+        egress: origin.example.com
+      feature-a:
+        source: Production
+        domain: feature-a.example.com
+        domains:
+          - feature-a.example.com
+        egress:
+          origins:
+            default: feature-a-origin.example.com
+            assets: assets.example.com
+          remove_headers:
+            - section-io-id
+    max_concurrency: 16
+- name: Show the plan without applying it
+  section.api.state:
+    environments: "{{ section_state }}"
+  check_mode: true
+  register: plan
+'''
+
+
+class ActionModule(ActionBase):
+
+    _supports_check_mode = True
+
+    def run(self, tmp=None, task_vars=None):
+        """Converge an application to a desired-state document.
+
+        The current state is fetched with one concurrent crawl and the plan
+        is worked out offline. Its operations are then applied in parallel,
+        each once the operations it depends on are done, eg. an environment
+        is created before its domains and egress are set.
+
+        Parameters
+        ----------
+        environments : dict
+            The desired state of each environment, keyed by name. Each may
+            have domains, a list of hostnames, and egress, an egress host name
+            for the default origin or a dict with origins and remove_headers
+            as taken by section.api.egress. Environments that do not exist
+            also need source, the environment to copy, and domain, their
+            first hostname. Settings that are left out are not managed
+        exclusive : bool, optional
+            Remove existing domains that are not listed in an environment's domains
+        remove_headers : list, optional
+            The request headers to remove for egress settings that do not list their own
+        max_concurrency : int, optional
+            The maximum number of requests in flight, defaults to 8
+        timeout : int, optional
+            How many seconds to wait for a created environment to become
+            usable before its domains and egress are set, defaults to 300
+        rate_limits : dict, optional
+            rate and burst per endpoint class (read, write or ban), eg.
+            {'write': {'rate': 10, 'burst': 10}}, requests are not throttled by default
+        retries : int, optional
+            The number of times a transient failure is retried, defaults to 5
+
+        Raises
+        ----------
+        AnsibleError
+            Raised when parameters are missing or API request fails
+
+        Environment
+        ----------
+        section_username : str
+            The account name to authenticate with the API
+        section_password : str
+            The password (or token) to authenticate with the API
+        section_account : str
+            The section account id
+        section_application : str
+            The section application id
+        """
+
+        if task_vars is None:
+            task_vars = dict()
+
+        result = super(ActionModule, self).run(tmp, task_vars)
+
+        validation, args = self.validate_argument_spec(
+            argument_spec=dict(
+                section_username=dict(type='str'),
+                section_password=dict(type='str', no_log=True),
+                section_account=dict(type='int', aliases=['account']),
+                section_application=dict(type='int', aliases=['application']),
+                headers=dict(type='dict', default={}),
+                environments=dict(type='dict', required=True),
+                exclusive=dict(type='bool', default=False),
+                remove_headers=dict(type='list', elements='str'),
+                max_concurrency=dict(type='int', default=8),
+                timeout=dict(type='int', default=300),
+                rate_limits=dict(type='dict'),
+                retries=dict(type='int'),
+            ),
+        )
+
+        max_concurrency = args['max_concurrency']
+        desired = normalise_state(args['environments'], args['remove_headers'])
+
+        client = ApiClient(
+            args.get('section_account') or task_vars.get('section_account'),
+            args.get('section_application') or task_vars.get('section_application'),
+            args.get('section_username') or task_vars.get('section_username'),
+            args.get('section_password') or task_vars.get('section_password'),
+            {
+                'headers': args['headers'],
+                'pool_size': max_concurrency,
+                'rate_limits': args['rate_limits'],
+                'retries': args['retries'],
+            }
+        )
+
+        current = snapshot_state(client, desired, max_concurrency)
+        plan = plan_state(current, desired, args['exclusive'])
+
+        result['changed'] = bool(plan['operations'])
+        result['plan'] = dict((key, plan[key]) for key in ('create', 'domains', 'egress'))
+
+        display.vv('Plan for section.api.state: %d operations' % len(plan['operations']))
+
+        if self._task.check_mode or not plan['operations']:
+            return result
+
+        result['applied'] = apply_plan(client, plan, max_concurrency, args['timeout'])
+
+        return result
@@ -1,12 +1,18 @@
 from __future__ import absolute_import, division, print_function
 
+import hashlib
 import json
 import os
 import re
+import time
 
 from ansible.errors import AnsibleError
 from ansible.plugins.inventory import BaseInventoryPlugin, Constructable, Cacheable
 from ansible_collections.section.api.plugins.module_utils.client import Client as ApiClient
+from ansible_collections.section.api.plugins.module_utils.concurrency import run_concurrently
+from ansible_collections.section.api.plugins.module_utils.inventory_model import InventoryModel
+from ansible_collections.section.api.plugins.module_utils.prefetch import PREFETCH_KINDS, PREFETCH_PATHS, prefetch_environments, prefetch_marker
+from ansible_collections.section.api.plugins.module_utils.session import sessions
 
 __metaclass__ = type
 
@@ -36,6 +42,90 @@ DOCUMENTATION = """
               limit_accounts:
                 description:
                 - List of account ids to limit the inventory to.
+                - Each account is fetched directly instead of listing every account of the user.
+              limit_applications:
+                description:
+                - List of application ids or names to limit the inventory to.
+                - The environments of other applications are never fetched.
+      refresh_accounts:
+          description:
+          - List of account ids to re-fetch even when they are present in the inventory cache.
+          - Other cached accounts are reused until they are older than O(cache_timeout).
+          type: list
+          elements: str
+          default: []
+      incremental:
+          description:
+          - Refresh a cached inventory one application at a time instead of one account at a time.
+          - Each cached application keeps a fingerprint of its environments listing,
+            only applications whose listing changed have their environments rebuilt.
+          - O(refresh_accounts) forces the application listing of those accounts to be checked.
+          type: bool
+          default: false
+      account_ttl:
+          description:
+          - With O(incremental), seconds an account's cached application listing is used before it is checked for changes.
+          - Defaults to O(cache_timeout). Set to 0 to check every account on every run.
+          - Checking an account costs one application listing request.
+          type: int
+      application_ttl:
+          description:
+          - With O(incremental), seconds an application's cached environments are used before its listing is checked for changes.
+          - Defaults to O(cache_timeout). Set to 0 to check every application on every run.
+          - Checking still costs one environments listing request per application, plus the O(prefetch) requests
+            of each of its environments, so short TTLs on large accounts cost almost as much as a full crawl.
+          type: int
+      include_environments:
+          description:
+          - Regular expressions, only environments whose name matches one of them are added to the inventory.
+          - An empty list includes every environment.
+          type: list
+          elements: str
+          default: []
+      exclude_environments:
+          description:
+          - Regular expressions, environments whose name matches one of them are left out of the inventory.
+          - Applied after O(include_environments).
+          type: list
+          elements: str
+          default: []
+      prefetch:
+          description:
+          - Environment sub-resources to fetch during the crawl and add to each host's vars, and to the inventory cache.
+          - V(egress) adds the environment's egress configuration as the C(egress) hostvar,
+            the section.api.egress action then compares against it without an API call.
+          - V(proxy_config) adds the varnish proxy configuration as the C(proxy_config) hostvar.
+          - V(domains) lets the section.api.domain action use the C(domains) hostvar instead of fetching the environment.
+          - Sub-resources are fetched again whenever an application's environments are checked, even when the
+            listing fingerprint is unchanged, since egress and proxy configuration changes do not alter the listing.
+          - The C(section_prefetch) hostvar names the kinds fetched on this run. Actions only use hostvars fetched
+            on the same run, not ones loaded from the inventory cache, and stop using them once a task changes them.
+          - With O(incremental), hosts of applications that are not checked on a run keep their cached hostvars,
+            and actions fetch those sub-resources again themselves. Lower O(application_ttl) to have the crawl
+            fetch them instead.
+          type: list
+          elements: str
+          choices: [domains, egress, proxy_config]
+          default: []
+      max_concurrency:
+          description:
+          - Maximum number of API requests to run in parallel while fetching applications and environments.
+          - Hosts and groups are always added in the same order as a serial fetch.
+          type: int
+          default: 1
+      rate_limits:
+          description:
+          - Requests per second (C(rate)) and burst size (C(burst)) for each endpoint class, C(read), C(write) or C(ban).
+          - Requests are not throttled by default, a rate of 0 disables the limit of a class.
+          type: dict
+          default: {}
+      retries:
+          description:
+          - Number of times a request is retried after a 429, a 503, or for reads another 5xx or a connection error.
+          type: int
+          default: 5
+    extends_documentation_fragment:
+      - inventory_cache
     requirements:
     - "python >= 3.6"
     - "PyYAML >= 3.11"
@@ -50,6 +140,52 @@ connections:
     password: password
     limit_accounts:
     - 1
+max_concurrency: 8
+
+# Keep the crawl in a jsonfile cache for an hour, re-fetching account 1 on this run
+plugin: section.api.applications
+cache: true
+cache_plugin: jsonfile
+cache_connection: /tmp/section_inventory
+cache_timeout: 3600
+refresh_accounts:
+  - 1
+connections:
+  - username: testuser
+    password: password
+
+# Only the production environments of two applications of account 1
+plugin: section.api.applications
+connections:
+  - username: testuser
+    password: password
+    limit_accounts:
+      - 1
+    limit_applications:
+      - 101
+      - www.example.com
+include_environments:
+  - ^Production$
+
+# Add each environment's egress to its hostvars, for the section.api.egress action
+plugin: section.api.applications
+prefetch:
+  - egress
+max_concurrency: 8
+connections:
+  - username: testuser
+    password: password
+
+# Crawl a large account with at most 20 reads per second
+plugin: section.api.applications
+max_concurrency: 8
+rate_limits:
+  read:
+    rate: 20
+    burst: 20
+connections:
+  - username: testuser
+    password: password
 """
 
 
@@ -57,10 +193,14 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
 
     NAME = "section.api.applications"
 
+    include_environments = ()
+    exclude_environments = ()
+    prefetch = ()
+
     def parse(self, inventory, loader, path, cache=True):
         super(InventoryModule, self).parse(inventory, loader, path)
-        cache_key = self._get_cache_prefix(path)
         config_data = self._read_config_data(path)
+        cache_key = self.get_cache_key(path)
         self.setup(config_data, cache, cache_key)
 
     def slugify(self, text):
@@ -68,11 +208,12 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
 
     def setup(self, config_data, cache, cache_key):
 
-        connections = config_data.get('connections')
+        connections = config_data.get('connections') or []
 
-        source_data = None
+        use_cache = self.get_option('cache')
+        source_data = {}
 
-        if cache and cache_key in self._cache:
+        if use_cache and cache:
             try:
                 source_data = self._cache[cache_key]
             except KeyError:
@@ -81,32 +222,133 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
         config_spec = dict(
             username=os.getenv('SECTION_IO_USERNAME'),
             password=os.getenv('SECTION_IO_PASSWORD'),
-            limit_accounts=[]
+            limit_accounts=[],
+            limit_applications=[]
         )
 
-        if not source_data:
-            if len(connections) == 0:
-                if os.getenv('SECTION_IO_ACCOUNT_ID'):
-                    config_spec['limit_accounts'] = [os.getenv('SECTION_IO_ACCOUNT_ID')]
-                connections.append(config_spec)
+        if len(connections) == 0:
+            if os.getenv('SECTION_IO_ACCOUNT_ID'):
+                config_spec['limit_accounts'] = [os.getenv('SECTION_IO_ACCOUNT_ID')]
+            connections.append(config_spec)
+
+        max_concurrency = self.get_option('max_concurrency')
+        refresh_accounts = [str(sid) for sid in self.get_option('refresh_accounts')]
+        self.include_environments = [re.compile(pattern) for pattern in self.get_option('include_environments')]
+        self.exclude_environments = [re.compile(pattern) for pattern in self.get_option('exclude_environments')]
+        self.prefetch = [kind for kind in PREFETCH_KINDS if kind in self.get_option('prefetch')]
+
+        cache_data = {}
+        model = InventoryModel()
+        needs_update = set(source_data) != set(
+            self.connection_key(dict(config_spec, **connection)) for connection in connections)
+
+        for connection in connections:
+            connection = dict(config_spec, **connection)
+            key = self.connection_key(connection)
+
+            accounts, updated = self.load_connection(connection, source_data.get(key), refresh_accounts, max_concurrency)
+            needs_update = needs_update or updated
+
+            cache_data[key] = accounts
+            model.add_accounts(accounts)
+
+        self.populate(model)
+
+        if use_cache and needs_update:
+            self._cache[cache_key] = cache_data
+
+        for session in sessions():
+            self.display.vv('Section API request stats for %s: %s' % (session.username, session.stats()))
+
+    def load_connection(self, connection, cached, refresh_accounts, max_concurrency=1):
+        """Return a connection's account tree, from the cache where it is still fresh.
+
+        Parameters
+        ----------
+        connection : dict
+            The connection settings, with defaults applied
+        cached : list|None
+            The connection's accounts from the inventory cache, if any
+        refresh_accounts : list
+            Account ids to re-fetch even when they are cached
+        max_concurrency : int, optional
+            The maximum number of requests in flight
+
+        Returns
+        ----------
+        tuple
+            The accounts, and whether anything was fetched
+        """
+
+        if cached is None:
+            try:
+                return self.fetch(max_concurrency=max_concurrency, **connection), True
+            except KeyError:
+                raise AnsibleError('Invalid connection dict')
 
-            for connection in connections:
-                connection = dict(config_spec, **connection)
-                try:
-                    self.fetch(**connection)
-                except KeyError:
-                    raise AnsibleError('Invalid connection dict')
+        if self.get_option('incremental'):
+            client = self.client(connection['username'], connection['password'], max_concurrency)
+            updated = self.refresh_applications(client, cached, refresh_accounts, max_concurrency,
+                                                connection['limit_applications'])
+            return cached, bool(updated)
+
+        stale = self.stale_accounts(cached, refresh_accounts)
+
+        if stale:
+            client = self.client(connection['username'], connection['password'], max_concurrency)
+            self.fetch_applications(client, stale, max_concurrency, connection['limit_applications'])
+
+        return cached, bool(stale)
+
+    def client(self, username, password, max_concurrency=1):
+        """Create an API client with the plugin's pool size, rate limits and retries."""
+
+        return ApiClient(username, password, {
+            'pool_size': max_concurrency,
+            'rate_limits': self.get_option('rate_limits'),
+            'retries': self.get_option('retries'),
+        })
+
+    def connection_key(self, connection):
+        """Build the key a connection's account tree is cached under."""
+
+        # Filters are part of the key, a cached tree only holds what they let through.
+        limit = ','.join(sorted(str(sid) for sid in connection.get('limit_accounts') or []))
+        applications = ','.join(sorted(str(app) for app in connection.get('limit_applications') or []))
+        environments = json.dumps([self.get_option('include_environments'), self.get_option('exclude_environments')])
+        prefetch = ','.join(sorted(self.get_option('prefetch')))
+
+        key = f"{connection.get('name') or ''}:{connection.get('username')}:{limit}"
+        if applications or environments != '[[], []]':
+            key = f'{key}:{applications}:{environments}'
+        if prefetch:
+            key = f'{key}:prefetch={prefetch}'
+        return key
+
+    def fetch(self, username, password, limit_accounts=[], limit_applications=[], name=None, max_concurrency=1):
+        """Fetch the account, application and environment tree for a connection.
+
+        Application and environment listings are requested with up to
+        max_concurrency calls in flight. With limit_accounts each account is
+        requested directly, instead of listing every account of the user.
+
+        Returns
+        ----------
+        list
+            The accounts, each with its applications and their environments
+        """
 
-    def fetch(self, username, password, limit_accounts=[]):
         accounts = []
 
-        client = ApiClient(username, password)
-        response = client.request('/account')
+        client = self.client(username, password, max_concurrency)
 
-        for account in response:
+        if limit_accounts:
+            listing = run_concurrently(lambda sid: client.request(f'/account/{sid}'), limit_accounts, max_concurrency)
+        else:
+            listing = client.iter_items('/account')
+
+        for account in listing:
             try:
-                if len(limit_accounts) > 0 and account['id'] not in limit_accounts:
-                    continue
                 accounts.append({
                     'id': account['id'],
                     'name': self.slugify(account['account_name']),
@@ -114,48 +356,245 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
             except KeyError as key:
                 raise AnsibleError(f'Invalid account definition, missing ({key}) from response.')
 
-        # Fetch applications for the accounts.
-        for account in accounts:
-            sid = account['id']
+        return self.fetch_applications(client, accounts, max_concurrency, limit_applications)
+
+    def stale_accounts(self, accounts, refresh_accounts):
+        """Find the accounts of a cached account tree that must be re-fetched.
+
+        An account is stale when its id is listed in refresh_accounts or it
+        was fetched longer than cache_timeout seconds ago. The remaining
+        accounts are used as they were cached without any API calls.
+        """
+
+        timeout = self.get_option('cache_timeout')
+        now = time.time()
+
+        return [
+            account for account in accounts
+            if str(account['id']) in refresh_accounts or (timeout and now - account.get('fetched_at', 0) > timeout)
+        ]
+
+    def refresh_applications(self, client, accounts, refresh_accounts, max_concurrency=1, limit_applications=None):
+        """Incrementally refresh a cached account tree.
+
+        Accounts listed in refresh_accounts, or checked longer than
+        account_ttl seconds ago, have their application listing fetched
+        again. Applications that are new, or were checked longer than
+        application_ttl seconds ago, have their environments listing
+        fetched and only those whose listing fingerprint changed are
+        rebuilt.
+
+        Returns
+        ----------
+        bool
+            Whether anything was fetched
+        """
 
-            self.inventory.add_group(account['name'])
+        account_ttl = self.get_option('account_ttl')
+        if account_ttl is None:
+            account_ttl = self.get_option('cache_timeout')
 
-            applications = client.request(f'/account/{sid}/application')
+        application_ttl = self.get_option('application_ttl')
+        if application_ttl is None:
+            application_ttl = self.get_option('cache_timeout')
+
+        now = time.time()
+
+        checked = [
+            account for account in accounts
+            if str(account['id']) in refresh_accounts or now - account.get('fetched_at', 0) >= account_ttl
+        ]
+
+        listings = run_concurrently(lambda account: self.list_applications(client, account, limit_applications),
+                                    checked, max_concurrency)
+
+        for account, applications in zip(checked, listings):
+            cached = dict((application['id'], application) for application in account['applications'])
 
             for application in applications:
+                previous = cached.get(application['id'])
+                if previous and 'environments' in previous:
+                    application['environments'] = previous['environments']
+                    application['fingerprint'] = previous.get('fingerprint')
+                    application['fetched_at'] = previous.get('fetched_at', 0)
+
+            account['fetched_at'] = now
+            account['applications'] = applications
+
+        pairs = [
+            (account, application) for account in accounts for application in account['applications']
+            if 'environments' not in application or now - application.get('fetched_at', 0) >= application_ttl
+        ]
+
+        changed = self.fetch_environments(client, pairs, max_concurrency)
+        self.display.vv('Section API incremental refresh: %d of %d checked applications changed' % (len(changed), len(pairs)))
+
+        return bool(checked or pairs)
+
+    def list_applications(self, client, account, limit_applications=None):
+        """Fetch the application listing of an account.
+
+        Parameters
+        ----------
+        limit_applications : list, optional
+            Application ids or names to keep, others are dropped before their
+            environments are fetched
+        """
+
+        limit = set(str(app) for app in limit_applications or [])
+        applications = []
+
+        for application in client.iter_items(f"/account/{account['id']}/application"):
+            try:
+                record = {'id': application['id'], 'name': application['application_name']}
+            except KeyError as key:
+                raise AnsibleError(f'Invalid application definition, missing ({key}) from response.')
+
+            if limit and str(record['id']) not in limit and record['name'] not in limit:
+                continue
+
+            applications.append(record)
+
+        return applications
+
+    def fetch_environments(self, client, pairs, max_concurrency=1):
+        """Fetch the environments of (account, application) pairs.
+
+        Each application is stamped with the time it was fetched and a
+        fingerprint of its environments listing. Its environment records
+        are only rebuilt when the fingerprint differs from the one it
+        already has. The prefetch sub-resources of every environment are
+        fetched again either way, and the environment marked as prefetched
+        on this run.
+
+        Returns
+        ----------
+        list
+            The applications whose environments changed
+        """
+
+        def fetch_environments(pair):
+            account, application = pair
+            return list(client.iter_items(f"/account/{account['id']}/application/{application['id']}/environment"))
+
+        changed = []
+
+        for (account, application), listing in zip(pairs, run_concurrently(fetch_environments, pairs, max_concurrency)):
+            fingerprint = hashlib.sha1(json.dumps(listing, sort_keys=True).encode('utf-8')).hexdigest()
+            application['fetched_at'] = time.time()
+
+            if 'environments' in application and application.get('fingerprint') == fingerprint:
+                continue
+
+            environments = []
+
+            for environment in listing:
+                if not self.wanted_environment(environment['environment_name']):
+                    continue
+
+                record = {'name': environment['environment_name']}
+
                 try:
-                    app_id = application['id']
-                    app_name = application['application_name']
-                except KeyError as key:
-                    raise AnsibleError(f'Invalid application definition, missing ({key}) from response.')
+                    record['domains'] = [domain['name'] for domain in environment['domains']]
+                except KeyError:
+                    pass
+
+                environments.append(record)
+
+            application['fingerprint'] = fingerprint
+            application['environments'] = environments
+            changed.append(application)
+
+        if self.prefetch:
+            self.prefetch_applications(client, pairs, max_concurrency)
+
+        return changed
+
+    def prefetch_applications(self, client, pairs, max_concurrency=1):
+        """Fetch the prefetch sub-resources of the environments of (account, application) pairs.
+
+        Each environment is marked as prefetched on this run, its
+        sub-resources are fetched again when prefetch lists any.
+        """
+
+        targets = [
+            (account, application, environment)
+            for account, application in pairs for environment in application['environments']
+        ]
+        kinds = [kind for kind in self.prefetch if kind in PREFETCH_PATHS]
+
+        prefetched = prefetch_environments(
+            client,
+            [(account['id'], application['id'], environment['name']) for account, application, environment in targets],
+            kinds,
+            max_concurrency
+        ) if kinds else [None] * len(targets)
+
+        for (account, application, environment), resources in zip(targets, prefetched):
+            if resources:
+                environment['prefetched'] = resources
+            environment['prefetch'] = prefetch_marker(self.prefetch)
+
+    def wanted_environment(self, name):
+        """Whether an environment passes include_environments and exclude_environments."""
+
+        if self.include_environments and not any(pattern.search(name) for pattern in self.include_environments):
+            return False
+
+        return not any(pattern.search(name) for pattern in self.exclude_environments)
+
+    def fetch_applications(self, client, accounts, max_concurrency=1, limit_applications=None):
+        """Fetch the applications and environments for a list of accounts.
+
+        The accounts are updated in place and stamped with the time they
+        were fetched. Applications outside limit_applications are dropped
+        before their environments are fetched.
+        """
+
+        listings = run_concurrently(lambda account: self.list_applications(client, account, limit_applications),
+                                    accounts, max_concurrency)
+
+        for account, applications in zip(accounts, listings):
+            account['fetched_at'] = time.time()
+            account['applications'] = applications
+
+        # Fetch environments for every application of every account.
+        pairs = [(account, application) for account in accounts for application in account['applications']]
+
+        self.fetch_environments(client, pairs, max_concurrency)
+
+        return accounts
+
+    def populate(self, model):
+        """Add the groups, hosts and hostvars of an InventoryModel in one pass.
 
-                # Add inventory group for the application.
-                self.inventory.add_group(app_name)
+        Every host has the same few hostvar names. The first host with a
+        name sets it through set_variable, which validates it. Hosts this
+        pass adds have no variables for a hostvar to be merged with, so
+        once their names are validated their hostvars are set in one update.
+        """
 
-                environments = client.request(f'/account/{sid}/application/{app_id}/environment')
+        inventory = self.inventory
+        validated = set()
 
-                for environment in environments:
-                    env_name = environment['environment_name']
-                    host_name = f'{sid}-{app_name}-{env_name}'
+        for group in model.groups:
+            inventory.add_group(group)
 
-                    self.inventory.add_group(env_name)
+        for record in model.hosts:
+            added = record.name not in inventory.hosts
 
-                    # Add the host to the groups.
-                    self.inventory.add_host(host_name)
-                    self.inventory.add_child(env_name, host_name)
-                    self.inventory.add_child(app_name, host_name)
-                    self.inventory.add_child(account['name'], host_name)
+            # Add the host to its environment group, then the others.
+            inventory.add_host(record.name, group=record.branch)
+            inventory.add_child(record.app_name, record.name)
+            inventory.add_child(record.account_name, record.name)
 
-                    # Add hostvars.
-                    self.inventory.set_variable(host_name, 'branch', env_name)
-                    self.inventory.set_variable(host_name, 'id', app_id)
-                    self.inventory.set_variable(host_name, 'name', app_name)
-                    self.inventory.set_variable(host_name, 'section_id', sid)
+            hostvars = record.hostvars()
 
-                    try:
-                        self.inventory.set_variable(host_name, 'domains', list(
-                            map(lambda x: x["name"], environment['domains'])))
-                    except KeyError:
-                        pass
+            if added and validated.issuperset(hostvars):
+                inventory.hosts[record.name].vars.update(hostvars)
+                continue
 
+            for key, value in hostvars.items():
+                inventory.set_variable(record.name, key, value)
 
+            validated.update(hostvars)
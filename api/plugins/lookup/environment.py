@@ -1,43 +1,92 @@
 from __future__ import (absolute_import, division, print_function)
-from ansible_collections.section.api.plugins.module_utils.env_client import EnvClient as ApiClient
+from ansible_collections.section.api.plugins.module_utils.async_client import AsyncEnvClient as ApiClient, gather, run as run_on_loop
+from ansible.errors import AnsibleError
 from ansible.plugins.lookup import LookupBase
 from ansible.utils.display import Display
 __metaclass__ = type
 
+try:
+    import jmespath
+    HAS_JMESPATH = True
+except ImportError:
+    HAS_JMESPATH = False
+
 DOCUMENTATION = """
   name: environment
   author: Steve Worley <steven.worley@salsadigital.com.au>
   short_description: get a section environment
   description:
       - This lookup returns the information for a Section environment.
+      - Several environments are requested concurrently on an event loop, not a thread per request.
+      - With O(projection) or O(include) it returns a snapshot instead, see those options.
+  requirements:
+      - jmespath, for O(projection)
   options:
     _terms:
       description: The environment to query for
       required: True
-    username:
+    section_username:
       description: The API user
       type: string
       required: True
       vars:
         - name: section_username
-    password:
+    section_password:
       description: The API users password
       type: string
       required: true
       vars:
         - name: section_password
-    account:
+    section_account:
         description: The account id
-        type: long
+        type: int
         required: true
-    application:
+        vars:
+          - name: section_account
+    section_application:
         description: The application id
-        type: long
+        type: int
         required: true
+        vars:
+          - name: section_application
     headers:
       description: HTTP request headers
       type: dictionary
       default: {}
+    max_concurrency:
+      description: Maximum number of environments to request in parallel.
+      type: int
+      default: 8
+    batch_threshold:
+      description:
+        - When more terms than this are given, all environments are listed with a single request and filtered locally.
+        - Set to 0 to always request each environment on its own.
+      type: int
+      default: 5
+    rate_limits:
+      description:
+        - Requests per second (C(rate)) and burst size (C(burst)) for each endpoint class, C(read), C(write) or C(ban).
+        - Requests are not throttled by default, a rate of 0 disables the limit of a class.
+      type: dict
+      default: {}
+    retries:
+      description: Number of times a request is retried after a 429, a 503, or another 5xx or a connection error.
+      type: int
+      default: 5
+    include:
+      description:
+        - Return a snapshot of the environments. All environments are listed with a single request and their
+          sub-resources are only returned when listed here, C(domains) from the listing and C(egress) fetched
+          concurrently for each returned environment.
+        - Without terms a snapshot returns every environment of the application.
+      type: list
+      elements: str
+      choices: [domains, egress]
+    projection:
+      description:
+        - A JMESPath expression applied to each environment of a snapshot, only its result is returned.
+        - Implies a snapshot, see O(include).
+      type: string
     timeout:
       description: How long to wait for the server to send data before giving up
       type: float
@@ -54,6 +103,15 @@ DOCUMENTATION = """
 EXAMPLES = """
 - name: retrieve a environment's information
   debug: msg="{{ lookup('section.api.environment', 'Develop', section_account=1, section_application=1) }}"
+
+- name: retrieve several environments with a single listing request
+  debug: msg="{{ lookup('section.api.environment', *branches, section_account=1, section_application=1, batch_threshold=2) }}"
+
+- name: retrieve the hostnames of every environment
+  debug: msg="{{ lookup('section.api.environment', include=['domains'], projection='{name: environment_name, hostnames: domains[].name}') }}"
+
+- name: retrieve the default egress origin of some environments
+  debug: msg="{{ lookup('section.api.environment', 'Develop', 'Master', include=['egress'], projection='egress.origins.default.address') }}"
 """
 
 display = Display()
@@ -71,10 +129,95 @@ class LookupModule(LookupBase):
             self.get_option('section_application'),
             self.get_option('section_username'),
             self.get_option('section_password'),
-            {'headers': self.get_option('headers', {})}
+            {
+                'headers': self.get_option('headers', {}),
+                'pool_size': self.get_option('max_concurrency'),
+                'rate_limits': self.get_option('rate_limits'),
+                'retries': self.get_option('retries'),
+            }
         )
 
-        for term in terms:
-            ret.append(client.get(term))
+        terms = list(terms)
+        batch_threshold = self.get_option('batch_threshold')
+
+        if self.get_option('projection') or self.get_option('include'):
+            return self.snapshot(client, terms)
+
+        if batch_threshold and len(terms) > batch_threshold:
+            environments = dict((environment.get('environment_name'), environment) for environment in run_on_loop(client.all()))
+
+            for term in terms:
+                if term not in environments:
+                    raise AnsibleError(f"Environment '{term}' was not found")
+                ret.append(environments[term])
+
+            return ret
+
+        return gather((client.get(term) for term in terms), self.get_option('max_concurrency'))
+
+    def snapshot(self, client, terms):
+        """List the environments once and return the projection of each.
+
+        Parameters
+        ----------
+        client : AsyncEnvClient
+            The client for the application
+        terms : list
+            The environment names, or every environment when empty
+
+        Raises
+        ----------
+        AnsibleError
+            Raised when an environment is missing or the projection is invalid
+        """
+
+        include = self.get_option('include') or []
+        expression = self.projection()
+
+        environments = run_on_loop(client.all())
+
+        if terms:
+            by_name = dict((environment.get('environment_name'), environment) for environment in environments)
+            missing = [term for term in terms if term not in by_name]
+            if missing:
+                raise AnsibleError(f"Environment '{missing[0]}' was not found")
+            environments = [by_name[term] for term in terms]
+
+        records = []
+        for environment in environments:
+            record = dict(environment)
+            if 'domains' not in include:
+                record.pop('domains', None)
+            records.append(record)
+
+        if 'egress' in include:
+            names = [record['environment_name'] for record in records]
+            for record, egress in zip(records, gather((client.list_egress(name) for name in names), self.get_option('max_concurrency'))):
+                record['egress'] = egress
+
+        if expression is None:
+            return records
+
+        return [expression.search(record) for record in records]
+
+    def projection(self):
+        """Compile the projection option, None when it is not set.
+
+        Raises
+        ----------
+        AnsibleError
+            Raised when jmespath is missing or the expression is invalid
+        """
+
+        projection = self.get_option('projection')
+
+        if not projection:
+            return None
+
+        if not HAS_JMESPATH:
+            raise AnsibleError('You need to install "jmespath" prior to using the projection option')
 
-        return ret
+        try:
+            return jmespath.compile(projection)
+        except jmespath.exceptions.JMESPathError as e:
+            raise AnsibleError(f"Invalid projection '{projection}': {e}")
@@ -0,0 +1,264 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import asyncio
+import functools
+import json
+import time
+
+from ansible.module_utils.urls import ConnectionError, SSLValidationError
+from ansible.module_utils._text import to_native
+from ansible.module_utils.six.moves.urllib.error import HTTPError, URLError
+from ansible_collections.section.api.plugins.module_utils.async_transport import get_loop
+from ansible_collections.section.api.plugins.module_utils.client import BODY_METHODS, Client, api_error, display, log
+from ansible_collections.section.api.plugins.module_utils.env_client import EnvClient
+from ansible_collections.section.api.plugins.module_utils.pagination import page_items
+from ansible_collections.section.api.plugins.module_utils.proxy_client import ProxyClient
+
+
+def run(awaitable):
+    """Run an awaitable on the shared event loop and return its result.
+
+    For sync code such as plugins, it blocks the calling thread until the
+    awaitable is done. Coroutines already on the shared loop must await
+    instead.
+    """
+
+    loop = get_loop()
+
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+
+    if running is loop:
+        raise RuntimeError('run can not be called from the shared event loop, await the coroutine instead')
+
+    return asyncio.run_coroutine_threadsafe(_await(awaitable), loop).result()
+
+
+async def _await(awaitable):
+    return await awaitable
+
+
+async def gather_async(awaitables, max_concurrency=None):
+    """Await many awaitables with at most max_concurrency in flight.
+
+    Returns
+    ----------
+    list
+        The result of each awaitable, in the order given
+    """
+
+    awaitables = list(awaitables)
+
+    if not max_concurrency:
+        return await asyncio.gather(*awaitables)
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def bounded(awaitable):
+        async with semaphore:
+            return await awaitable
+
+    return await asyncio.gather(*[bounded(awaitable) for awaitable in awaitables])
+
+
+def gather(awaitables, max_concurrency=None):
+    """Await many awaitables on the shared event loop from sync code.
+
+    eg. gather(client.get(name) for name in names) fetches every environment
+    concurrently without a thread per request.
+
+    Parameters
+    ----------
+    awaitables : iterable
+        The coroutines to run, eg. calls to AsyncEnvClient methods
+    max_concurrency : int, optional
+        The maximum number in flight, unlimited by default
+
+    Returns
+    ----------
+    list
+        The result of each awaitable, in the order given
+    """
+
+    return run(gather_async(awaitables, max_concurrency))
+
+
+class AsyncClient(Client):
+    """An asyncio counterpart of Client.
+
+    Requests run on the shared event loop over the session's async
+    connection pool, with the same rate limits, retries, response cache and
+    metrics as Client. A sqlite response cache is read and written in a
+    worker thread, so it never blocks the loop. Every request method is a
+    coroutine, and iter_pages and iter_items are async generators.
+    """
+
+    def __init__(self, username, password, options=None):
+        Client.__init__(self, username=username, password=password, options=options)
+        self.pool = self.session.async_pool(self.options.get('pool_size'))
+
+    async def offload(self, func, *args):
+        """Call a response cache method, in a worker thread when it blocks on I/O."""
+
+        if self.cache is None or not self.cache.blocking:
+            return func(*args)
+
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args))
+
+    async def send(self, url, method='GET', payload={}, headers=None):
+        """Send a request and return the transport response, with its body read.
+
+        Only POST, PUT and PATCH requests carry the JSON payload.
+
+        Raises
+        ----------
+        AnsibleError
+            Raised when the request fails after any retries
+        """
+
+        log(1, 'API call path: %s', url)
+        log(1, 'API call payload: %s', payload)
+        log(1, 'Request headers: %s', self.options.get('headers'))
+
+        request_headers = dict(self.options.get('headers') or {})
+        request_headers.update(headers or {})
+        request_headers = self.session.request_headers(request_headers)
+        data = json.dumps(payload) if method in BODY_METHODS else None
+
+        trace = self.metrics.start(method, url) if self.metrics is not None else None
+
+        def send():
+            return self.pool.request(url,
+                                     method=method,
+                                     data=data,
+                                     validate_certs=self.options.get('validate_certs', False),
+                                     headers=request_headers,
+                                     timeout=self.options.get('timeout', 30),
+                                     trace=trace)
+
+        def on_retry(attempt, error, delay):
+            if trace is not None:
+                trace.retries = attempt
+            display.vv('API call retry %d for %s in %.2fs: %s' % (attempt, url, delay, to_native(error)))
+
+        try:
+            response = await self.scheduler.call_async(method, url, send, on_retry=on_retry, retries=self.options.get('retries'))
+        except (HTTPError, URLError, SSLValidationError, ConnectionError) as e:
+            if trace is not None:
+                trace.finish(error=to_native(e))
+            raise api_error(e)
+
+        if trace is not None:
+            trace.finish()
+
+        return response
+
+    async def request(self, path='', method='GET', payload={}, fresh=False):
+        url = self.url(path)
+
+        body = await self.offload(self.cached, url, method) if not fresh else None
+        if body is not None:
+            return json.loads(body)
+
+        conditional, stored = await self.offload(self.conditional, url, method)
+
+        start = time.time()
+
+        response = await self.send(url, method, payload, headers=conditional)
+
+        log(3, 'API call time: %.3fs', time.time() - start)
+
+        if response.status == 304 and stored is not None:
+            log(3, 'API response not modified: %s', url)
+            body = stored[2]
+        else:
+            body = response.read()
+            stored = None
+
+        await self.offload(self.store, url, method, body, response.headers, stored)
+
+        log(1, 'API call result: %s', body)
+
+        return json.loads(body)
+
+    async def fetch_page(self, url, fresh=False):
+        """Fetch one page of a list endpoint.
+
+        With fresh the page is requested even when the response cache has
+        it, eg. when polling, it is still revalidated with its ETag.
+
+        Returns
+        ----------
+        tuple
+            The page's items and the URL of the next page, or None
+        """
+
+        if self.cache is not None and not fresh:
+            document = await self.request(url)
+            return page_items(document), self.next_page(url, None, document)
+
+        conditional, stored = await self.offload(self.conditional, url)
+        response = await self.send(url, headers=conditional)
+
+        if response.status == 304 and stored is not None:
+            log(3, 'API response not modified: %s', url)
+            body = stored[2]
+        else:
+            body = response.read()
+            stored = None
+
+        # Pages paginated with a Link header are not kept, a 304 would not repeat the header.
+        if not response.headers.get('Link'):
+            await self.offload(self.store, url, 'GET', body, response.headers, stored)
+
+        document = json.loads(body)
+
+        return page_items(document), self.next_page(url, response.headers, document)
+
+    async def iter_pages(self, path='', fresh=False):
+        """Yield the pages of a list endpoint, prefetching the next one."""
+
+        pending = asyncio.ensure_future(self.fetch_page(self.url(path), fresh))
+
+        try:
+            while pending is not None:
+                items, next_url = await pending
+                pending = asyncio.ensure_future(self.fetch_page(next_url, fresh)) if next_url else None
+                yield items
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    async def iter_items(self, path='', fresh=False):
+        """Yield the items of a list endpoint across all of its pages."""
+
+        async for page in self.iter_pages(path, fresh):
+            for item in page:
+                yield item
+
+    def stats(self):
+        """Return the latency counters of the session's async connection pool."""
+
+        return self.pool.stats.summary()
+
+
+class AsyncEnvClient(AsyncClient, EnvClient):
+    """An asyncio counterpart of EnvClient, its methods are coroutines."""
+
+    def __init__(self, account, application, username, password, options=None):
+        EnvClient.__init__(self, account, application, username, password, options)
+        self.pool = self.session.async_pool(self.options.get('pool_size'))
+
+    async def all(self, fresh=False):
+        return [environment async for environment in self.iter_items(fresh=fresh)]
+
+
+class AsyncProxyClient(AsyncClient, ProxyClient):
+    """An asyncio counterpart of ProxyClient, its methods are coroutines."""
+
+    def __init__(self, account, application, username, password, options=None):
+        ProxyClient.__init__(self, account, application, username, password, options)
+        self.pool = self.session.async_pool(self.options.get('pool_size'))
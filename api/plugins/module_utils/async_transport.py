@@ -0,0 +1,316 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import asyncio
+import io
+import os
+import re
+import ssl
+import threading
+import time
+
+from ansible.module_utils.six.moves import http_client
+from ansible.module_utils.six.moves.urllib.error import HTTPError
+from ansible.module_utils.six.moves.urllib.parse import urlparse
+from ansible.module_utils.urls import ConnectionError, SSLValidationError
+from ansible_collections.section.api.plugins.module_utils.scheduler import IDEMPOTENT_METHODS
+from ansible_collections.section.api.plugins.module_utils.transport import RequestStats, Response, proxy_for
+
+# Connections open at once per host, requests beyond this wait for one to free up.
+DEFAULT_LIMIT = 100
+
+# The request line and header checks http.client applies, so a value with
+# a CR or LF can not inject headers or a second request.
+_ILLEGAL_METHOD = re.compile('[\x00-\x20\x7f]')
+_ILLEGAL_PATH = re.compile('[\x00-\x20\x7f]')
+_LEGAL_HEADER_NAME = re.compile(r'[^:\s][^:\r\n]*')
+_ILLEGAL_HEADER_VALUE = re.compile(r'\n(?![ \t])|\r(?![ \t\n])')
+
+_loop = None
+_loop_pid = None
+_lock = threading.Lock()
+
+
+def validate_request(method, path, headers):
+    """Reject a request line or headers that http.client would refuse.
+
+    Raises
+    ----------
+    ValueError
+        Raised when the method, path or a header contains control characters
+    """
+
+    if _ILLEGAL_METHOD.search(method):
+        raise ValueError(f'method can not contain control characters: {method!r}')
+
+    if _ILLEGAL_PATH.search(path):
+        raise http_client.InvalidURL(f'URL can not contain control characters: {path!r}')
+
+    for name, value in headers.items():
+        if not _LEGAL_HEADER_NAME.fullmatch(str(name)):
+            raise ValueError(f'Invalid header name {name!r}')
+        if _ILLEGAL_HEADER_VALUE.search(str(value)):
+            raise ValueError(f'Invalid header value {value!r}')
+
+
+class AsyncConnection:
+    """An HTTP/1.1 keep-alive connection over asyncio streams."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.connect_time = 0.0
+        self.tls_time = 0.0
+
+    def close(self):
+        self.writer.close()
+
+    async def read_body(self, headers):
+        if (headers.get('Transfer-Encoding') or '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b';', 1)[0], 16)
+                if size == 0:
+                    # Skip any trailers up to the blank line ending the body.
+                    while (await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    return b''.join(chunks)
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+
+        length = headers.get('Content-Length')
+        if length is not None:
+            return await self.reader.readexactly(int(length))
+
+        return await self.reader.read()
+
+    async def send(self, method, host, path, headers, data):
+        """Write a request, its line and headers must have been validated."""
+
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {host}']
+        if data or method in ('POST', 'PUT', 'PATCH'):
+            lines.append(f'Content-Length: {len(data)}')
+        lines.extend(f'{name}: {value}' for name, value in headers.items())
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + data)
+        await self.writer.drain()
+
+    async def read_response(self, method):
+        """Read the whole response to the request that was sent.
+
+        Returns
+        ----------
+        tuple
+            The status, reason, headers, body, whether the connection can be
+            reused and the perf_counter time the status line arrived
+        """
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise http_client.RemoteDisconnected('Remote end closed connection without response')
+
+        version, status, reason = (status_line.decode('latin-1').rstrip('\r\n').split(' ', 2) + [''])[:3]
+        first_byte = time.perf_counter()
+
+        header_lines = []
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            header_lines.append(line)
+
+        response_headers = http_client.parse_headers(io.BytesIO(b''.join(header_lines) + b'\r\n'))
+
+        body = b'' if method == 'HEAD' or int(status) in (204, 304) else await self.read_body(response_headers)
+
+        keep_alive = version == 'HTTP/1.1' and (response_headers.get('Connection') or '').lower() != 'close'
+
+        return int(status), reason, response_headers, body, keep_alive, first_byte
+
+
+class AsyncConnectionPool:
+    """A pool of keep-alive HTTP(S) connections for the shared event loop.
+
+    Connections are keyed by scheme, host, port and certificate validation.
+    At most limit connections are open per key, idle ones are reused.
+    Requests to hosts reached through a proxy (https_proxy, http_proxy and
+    no_proxy) are sent by the fallback ConnectionPool in a worker thread.
+
+    Parameters
+    ----------
+    limit : int, optional
+        The number of connections to open per host
+    fallback : ConnectionPool, optional
+        The pool that sends requests through a proxy
+    """
+
+    def __init__(self, limit=DEFAULT_LIMIT, fallback=None):
+        self.limit = limit
+        self.fallback = fallback
+        self.stats = RequestStats()
+        self._idle = {}
+        self._slots = {}
+
+    def _ssl_context(self, validate_certs):
+        context = ssl.create_default_context()
+        if not validate_certs:
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        return context
+
+    async def _connect(self, key):
+        scheme, host, port, validate_certs = key
+        https = scheme == 'https'
+
+        start = time.perf_counter()
+        reader, writer = await asyncio.open_connection(host, port or (443 if https else 80))
+
+        connection = AsyncConnection(reader, writer)
+        connected = time.perf_counter()
+        connection.connect_time = connected - start
+
+        # Upgrade after connecting, so the handshake is timed on its own.
+        if https:
+            try:
+                await writer.start_tls(self._ssl_context(validate_certs), server_hostname=host)
+            except BaseException:
+                writer.close()
+                raise
+            connection.tls_time = time.perf_counter() - connected
+
+        return connection
+
+    def _take_idle(self, key):
+        idle = self._idle.get(key)
+
+        while idle:
+            connection = idle.pop()
+            if not connection.reader.at_eof():
+                return connection
+            connection.close()
+
+        return None
+
+    def _slot(self, key):
+        if key not in self._slots:
+            self._slots[key] = asyncio.Semaphore(self.limit)
+        return self._slots[key]
+
+    def close(self):
+        """Close every idle connection."""
+
+        idle, self._idle = self._idle, {}
+
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+    async def _exchange(self, url, key, method, host, path, headers, data, timeout):
+        """Send a request on an idle or new connection and read its response.
+
+        Returns
+        ----------
+        tuple
+            The connection, whether it was reused, the perf_counter time the
+            request was sent and the result of read_response
+        """
+
+        while True:
+            connection = self._take_idle(key)
+            reused = connection is not None
+            written = False
+            try:
+                if not reused:
+                    connection = await asyncio.wait_for(self._connect(key), timeout)
+                sent = time.perf_counter()
+                await asyncio.wait_for(connection.send(method, host, path, headers, data), timeout)
+                written = True
+                response = await asyncio.wait_for(connection.read_response(method), timeout)
+                return connection, reused, sent, response
+            except (OSError, EOFError, asyncio.TimeoutError, asyncio.IncompleteReadError,
+                    asyncio.LimitOverrunError, http_client.HTTPException, ValueError) as e:
+                if connection is not None:
+                    connection.close()
+                # The server may have dropped a keep-alive connection just as
+                # it was reused, send again on a fresh connection unless the
+                # request was written and repeating it is not safe.
+                if reused and (not written or method in IDEMPOTENT_METHODS):
+                    continue
+                if isinstance(e, ssl.SSLError):
+                    raise SSLValidationError(str(e))
+                raise ConnectionError(f'{url}: {e or type(e).__name__}')
+
+    async def request(self, url, method='GET', headers=None, data=None, timeout=30, validate_certs=True, trace=None):
+        """Send a request over a pooled connection and read the whole body.
+
+        Takes the same parameters and raises the same errors as
+        ConnectionPool.request.
+
+        Returns
+        ----------
+        Response
+            The response with its body read
+        """
+
+        parsed = urlparse(url)
+        headers = headers or {}
+
+        if self.fallback is not None and proxy_for(parsed.scheme, parsed.hostname) is not None:
+            return await asyncio.get_running_loop().run_in_executor(None, lambda: self.fallback.request(
+                url, method=method, headers=headers, data=data, timeout=timeout, validate_certs=validate_certs, trace=trace))
+
+        key = (parsed.scheme, parsed.hostname, parsed.port, bool(validate_certs))
+        host = parsed.netloc.rsplit('@', 1)[-1]
+        path = parsed.path or '/'
+        if parsed.query:
+            path = f'{path}?{parsed.query}'
+
+        validate_request(method, path, headers)
+
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+
+        start = time.time()
+
+        async with self._slot(key):
+            connection, reused, sent, response = await self._exchange(url, key, method, host, path, headers, data or b'', timeout)
+            status, reason, response_headers, body, keep_alive, first_byte = response
+
+            if keep_alive:
+                self._idle.setdefault(key, []).append(connection)
+            else:
+                connection.close()
+
+        self.stats.record(time.time() - start, reused)
+
+        if trace is not None:
+            trace.reused = reused
+            trace.connect = 0.0 if reused else connection.connect_time
+            trace.tls = 0.0 if reused else connection.tls_time
+            trace.ttfb = first_byte - sent
+            trace.body = time.perf_counter() - first_byte
+            trace.status = status
+            trace.bytes_out = len(data or b'')
+            trace.bytes_in = len(body)
+
+        if status >= 400:
+            raise HTTPError(url, status, reason, response_headers, io.BytesIO(body))
+
+        return Response(url, status, reason, response_headers, body)
+
+
+def get_loop():
+    """Return the event loop shared by every async client in this process.
+
+    The loop runs in a daemon thread, so sync code can hand coroutines to it
+    with run and gather. A forked process starts a loop of its own.
+    """
+
+    global _loop, _loop_pid
+
+    with _lock:
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            threading.Thread(target=_loop.run_forever, name='section-api-loop', daemon=True).start()
+
+        return _loop
@@ -0,0 +1,108 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import time
+
+from ansible_collections.section.api.plugins.module_utils.concurrency import run_concurrently
+
+DEFAULT_TIMEOUT = 300
+DEFAULT_POLL_INTERVAL = 1.0
+MAX_POLL_INTERVAL = 15.0
+
+
+def pending(state, expression):
+    """Whether a proxy state document still lists a ban expression.
+
+    The state holds an entry per edge node, a ban is cleared once no node
+    reports the expression anywhere in its state.
+    """
+
+    if isinstance(state, dict):
+        return any(pending(value, expression) for value in state.values())
+
+    if isinstance(state, list):
+        return any(pending(value, expression) for value in state)
+
+    return isinstance(state, str) and expression in state
+
+
+def ban(client, name, expressions, proxy='varnish', wait=False, timeout=DEFAULT_TIMEOUT,
+        poll_interval=DEFAULT_POLL_INTERVAL):
+    """Submit ban expressions to one environment and optionally wait for them.
+
+    Parameters
+    ----------
+    client : ProxyClient
+        The client for the environment's application
+    name : str
+        The environment name
+    expressions : list
+        The ban expressions to submit
+    proxy : str, optional
+        The proxy to ban from
+    wait : bool, optional
+        Poll the proxy state, backing off up to MAX_POLL_INTERVAL, until
+        every edge node has cleared the expressions
+    timeout : float, optional
+        How many seconds to wait for the edge nodes
+    poll_interval : float, optional
+        The first delay between state polls
+
+    Returns
+    ----------
+    dict
+        The environment, its ban responses and timings in seconds
+    """
+
+    start = time.time()
+
+    responses = [client.ban(name, expression, proxy=proxy) for expression in expressions]
+
+    result = {
+        'environment': name,
+        'expressions': list(expressions),
+        'result': responses,
+        'submit_time': time.time() - start,
+    }
+
+    if not wait:
+        return result
+
+    remaining = list(expressions)
+    polls = 0
+    delay = poll_interval
+
+    while remaining:
+        state = client.state(name, proxy=proxy, fresh=True)
+        polls += 1
+        remaining = [expression for expression in remaining if pending(state, expression)]
+
+        if not remaining or time.time() - start + delay > timeout:
+            break
+
+        time.sleep(delay)
+        delay = min(delay * 2, MAX_POLL_INTERVAL)
+
+    result['cleared'] = not remaining
+    result['pending'] = remaining
+    result['polls'] = polls
+    result['elapsed'] = time.time() - start
+
+    return result
+
+
+def ban_environments(client, names, expressions, proxy='varnish', wait=False, timeout=DEFAULT_TIMEOUT,
+                     max_concurrency=4):
+    """Ban expressions from several environments in parallel.
+
+    Returns
+    ----------
+    list
+        The result of ban for each environment, in the order given
+    """
+
+    return run_concurrently(
+        lambda name: ban(client, name, expressions, proxy=proxy, wait=wait, timeout=timeout),
+        names,
+        max_concurrency
+    )
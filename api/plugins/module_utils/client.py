@@ -2,27 +2,99 @@ from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
 import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from ansible.errors import AnsibleError
-from ansible.module_utils.urls import open_url, ConnectionError, SSLValidationError
+from ansible.module_utils.urls import ConnectionError, SSLValidationError
 from ansible.module_utils._text import to_native
 from ansible.module_utils.six.moves.urllib.error import HTTPError, URLError
 from ansible.utils.display import Display
+from ansible_collections.section.api.plugins.module_utils.json_stream import load_json
+from ansible_collections.section.api.plugins.module_utils.metrics import get_metrics
+from ansible_collections.section.api.plugins.module_utils.pagination import next_page_url, page_items
+from ansible_collections.section.api.plugins.module_utils.response_cache import get_response_cache
+from ansible_collections.section.api.plugins.module_utils.scheduler import get_scheduler
+from ansible_collections.section.api.plugins.module_utils.session import get_session
 
 display = Display()
 
+DEFAULT_ENDPOINT = 'https://aperture.section.io/api/v1'
+
+# Logged values are cut to this many characters.
+MAX_LOG_LENGTH = 1024
+
+# Methods whose requests carry a JSON body, others are sent without one.
+BODY_METHODS = ('POST', 'PUT', 'PATCH')
+
+
+def _truncate(value):
+    if isinstance(value, bytes):
+        text = to_native(value[:MAX_LOG_LENGTH], errors='replace')
+        size = len(value)
+    else:
+        text = value if isinstance(value, str) else to_native(value)
+        size = len(text)
+        text = text[:MAX_LOG_LENGTH]
+
+    if size > MAX_LOG_LENGTH:
+        return '%s... (%d more)' % (text, size - MAX_LOG_LENGTH)
+
+    return text
+
+
+def log(level, message, *args):
+    """Log a message at a verbosity level.
+
+    The arguments are only formatted, and truncated to MAX_LOG_LENGTH, when
+    the message will actually be displayed.
+    """
+
+    if display.verbosity < level:
+        return
+
+    display.verbose(message % tuple(_truncate(arg) if not isinstance(arg, (int, float)) else arg for arg in args),
+                    caplevel=level - 1)
+
+
+def _recorded(chunks, received):
+    """Yield chunks while appending them to the received list."""
+
+    for chunk in chunks:
+        received.append(chunk)
+        yield chunk
+
+
+def api_error(e):
+    """Convert a transport error into an AnsibleError."""
+
+    if isinstance(e, HTTPError):
+        return AnsibleError("Received HTTP error: %s" % (to_native(e)))
+    if isinstance(e, URLError):
+        return AnsibleError("Failed lookup url: %s" % (to_native(e)))
+    if isinstance(e, SSLValidationError):
+        return AnsibleError("Error validating the server's certificate: %s" % (to_native(e)))
+    return AnsibleError("Error connecting: %s" % (to_native(e)))
+
+
 class Client:
 
-    def __init__(self, username, password, options={}):
+    def __init__(self, username, password, options=None):
+
+        if options is None:
+            options = {}
 
-        self.options = options
-        self.options['endpoint'] = 'https://aperture.section.io/api/v1'
+        if not isinstance(options, dict):
+            raise AnsibleError("Expecting client options to be dict.")
 
-        if 'headers' not in self.options:
-            self.options['headers'] = {}
+        # Work on a copy, the caller's options and headers are left untouched.
+        self.options = dict(options)
+        self.options['endpoint'] = os.getenv('SECTION_IO_ENDPOINT') or DEFAULT_ENDPOINT
 
-        if not isinstance(self.options, dict):
+        if not isinstance(self.options.get('headers') or {}, dict):
             raise AnsibleError("Expecting client headers to be dict.")
 
+        self.options['headers'] = dict(self.options.get('headers') or {})
         self.options['headers']['Content-Type'] = 'application/json'
 
         self.options['username'] = username
@@ -30,43 +102,301 @@ class Client:
 
         self.options['base_path'] = ''
 
-    def request(self, path='', method='GET', payload={}):
+        # Clients with the same credentials and endpoint share a session,
+        # and with it a pool of warm keep-alive connections.
+        self.session = get_session(username, password, self.options['endpoint'], self.options.get('pool_size'))
+        self.auth_header = self.session.auth_header
+        self.pool = self.session.pool
+
+        # Rate limiting and retries are shared by every client in the process.
+        self.scheduler = get_scheduler(self.options.get('rate_limits'))
+
+        # Opt-in read-through cache for GET responses.
+        self.cache = get_response_cache(self.options.get('cache'))
+
+        # ETag and Last-Modified validators for conditional GETs are kept
+        # with the cached responses, so only when caching is enabled. A
+        # persistent cache lets the next run revalidate instead of refetch.
+        if self.options.get('conditional') is False:
+            self.validators = None
+        else:
+            self.validators = self.cache
+
+        # Opt-in per-request timings, summarised per endpoint at exit.
+        self.metrics = get_metrics(self.options.get('metrics'))
+
+    def url(self, path=''):
+        if path.startswith(('http://', 'https://')):
+            return path
+
         endpoint = self.options.get('endpoint')
         base_path = self.options.get('base_path').lstrip('/')
 
         path = path.lstrip('/')
 
-        url = f'{endpoint}/{base_path}/{path}' if len(base_path) > 0 else f'{endpoint}/{path}'
+        return f'{endpoint}/{base_path}/{path}' if len(base_path) > 0 else f'{endpoint}/{path}'
 
-        display.v(f'API call path: {url}')
-        display.v("API call payload: %s" % payload)
-        display.v("Request headers: %s" % self.options.get('headers'))
+    def send(self, url, method='GET', payload={}, stream=False, headers=None):
+        """Send a request and return the transport response.
 
-        try:
-            response = open_url(f'{url}',
+        With stream the body is left unread so it can be consumed in chunks,
+        and the caller finishes the response's trace once it has been read.
+        Only POST, PUT and PATCH requests carry the JSON payload.
+
+        Raises
+        ----------
+        AnsibleError
+            Raised when the request fails after any retries
+        """
+
+        log(1, 'API call path: %s', url)
+        log(1, 'API call payload: %s', payload)
+        log(1, 'Request headers: %s', self.options.get('headers'))
+
+        request_headers = dict(self.options.get('headers') or {})
+        request_headers.update(headers or {})
+        request_headers = self.session.request_headers(request_headers)
+        data = json.dumps(payload) if method in BODY_METHODS else None
+
+        open_request = self.pool.open if stream else self.pool.request
+        trace = self.metrics.start(method, url) if self.metrics is not None else None
+
+        def send():
+            return open_request(f'{url}',
                                 method=method,
-                                url_username=self.options['username'],
-                                url_password=self.options['password'],
-                                data=json.dumps(payload),
-                                force_basic_auth=True,
+                                data=data,
                                 validate_certs=self.options.get(
                                     'validate_certs', False),
-                                headers=self.options.get('headers', {}),
-                                timeout=self.options.get('timeout', 30))
-        except HTTPError as e:
-            raise AnsibleError(
-                "Received HTTP error: %s" % (to_native(e)))
-        except URLError as e:
-            raise AnsibleError(
-                "Failed lookup url: %s" % (to_native(e)))
-        except SSLValidationError as e:
-            raise AnsibleError(
-                "Error validating the server's certificate: %s" % (to_native(e)))
-        except ConnectionError as e:
-            raise AnsibleError("Error connecting: %s" % (to_native(e)))
-
-        result = json.loads(response.read())
-
-        display.v('API call result: %s' % result)
-
-        return result
+                                headers=request_headers,
+                                timeout=self.options.get('timeout', 30),
+                                trace=trace)
+
+        def on_retry(attempt, error, delay):
+            if trace is not None:
+                trace.retries = attempt
+            display.vv('API call retry %d for %s in %.2fs: %s' % (attempt, url, delay, to_native(error)))
+
+        try:
+            response = self.scheduler.call(method, url, send, on_retry=on_retry, retries=self.options.get('retries'))
+        except (HTTPError, URLError, SSLValidationError, ConnectionError) as e:
+            if trace is not None:
+                trace.finish(error=to_native(e))
+            raise api_error(e)
+
+        if trace is not None and not stream:
+            trace.finish()
+
+        return response
+
+    def cached(self, url, method='GET'):
+        """Return the cached body of a GET request, or None."""
+
+        if method != 'GET' or self.cache is None:
+            return None
+
+        body = self.cache.get(url, self.auth_header)
+        if body is not None:
+            log(3, 'API cache hit: %s', url)
+
+        return body
+
+    def conditional(self, url, method='GET'):
+        """Look up the validators of a GET request's previous response.
+
+        Returns
+        ----------
+        tuple
+            The If-None-Match and If-Modified-Since headers to send, and the
+            stored ETag, Last-Modified and body, or None
+        """
+
+        if method != 'GET' or self.validators is None:
+            return {}, None
+
+        stored = self.validators.validators(url, self.auth_header)
+        if stored is None:
+            return {}, None
+
+        etag, last_modified, body = stored
+        headers = {}
+
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+        return headers, stored
+
+    def store(self, url, method, body, headers=None, stored=None):
+        """Cache the body of a GET request, or invalidate what a write changed.
+
+        The response's ETag and Last-Modified headers are stored with the
+        body, falling back to the stored validators a 304 was checked with.
+        """
+
+        store = self.cache
+        if store is None:
+            return
+
+        if method != 'GET':
+            store.invalidate(url)
+            return
+
+        etag = headers.get('ETag') if headers is not None else None
+        last_modified = headers.get('Last-Modified') if headers is not None else None
+
+        if stored is not None:
+            etag = etag or stored[0]
+            last_modified = last_modified or stored[1]
+
+        store.set(url, self.auth_header, body, etag, last_modified)
+
+    def request(self, path='', method='GET', payload={}, fresh=False):
+        url = self.url(path)
+
+        body = self.cached(url, method) if not fresh else None
+        if body is not None:
+            return json.loads(body)
+
+        conditional, stored = self.conditional(url, method)
+
+        start = time.time()
+
+        response = self.send(url, method, payload, headers=conditional)
+
+        log(3, 'API call time: %.3fs', time.time() - start)
+
+        if response.status == 304 and stored is not None:
+            log(3, 'API response not modified: %s', url)
+            body = stored[2]
+        else:
+            body = response.read()
+            stored = None
+
+        self.store(url, method, body, response.headers, stored)
+
+        log(1, 'API call result: %s', body)
+
+        return json.loads(body)
+
+    def fetch_page(self, url, fresh=False):
+        """Fetch one page of a list endpoint.
+
+        With fresh the page is requested even when the response cache has
+        it, eg. when polling, it is still revalidated with its ETag.
+
+        Returns
+        ----------
+        tuple
+            The page's items and the URL of the next page, or None
+        """
+
+        if self.cache is not None and not fresh:
+            document = self.request(url)
+            return page_items(document), self.next_page(url, None, document)
+
+        conditional, stored = self.conditional(url)
+
+        start = time.time()
+        response = self.send(url, stream=True, headers=conditional)
+
+        if response.status == 304 and stored is not None:
+            document = self.not_modified(url, response, stored)
+        else:
+            document = self.read_page(url, response)
+
+        log(3, 'API call time: %.3fs', time.time() - start)
+
+        return page_items(document), self.next_page(url, response.headers, document)
+
+    def not_modified(self, url, response, stored):
+        """Return the stored page a 304 response confirmed is still current."""
+
+        # Nothing to stream, drain the empty body to free the connection.
+        response.read()
+        if response.trace is not None:
+            response.trace.finish()
+
+        log(3, 'API response not modified: %s', url)
+        self.store(url, 'GET', stored[2], response.headers, stored)
+
+        return json.loads(stored[2])
+
+    def read_page(self, url, response):
+        """Decode a streamed page as its chunks arrive, keeping a copy to revalidate."""
+
+        chunks = response.iter_chunks()
+
+        # Keep a copy of pages that can be revalidated. Pages paginated with
+        # a Link header are not kept, a 304 would not repeat the header.
+        received = None
+        if self.validators is not None and not response.headers.get('Link') and (
+                response.headers.get('ETag') or response.headers.get('Last-Modified')):
+            received = []
+            chunks = _recorded(chunks, received)
+
+        try:
+            document = load_json(chunks)
+
+            # Drain the rest of the body so the connection can be reused.
+            for chunk in chunks:
+                pass
+        except (ConnectionError, ValueError) as e:
+            if response.trace is not None:
+                response.trace.finish(error=to_native(e))
+            if isinstance(e, ConnectionError):
+                raise AnsibleError("Error connecting: %s" % (to_native(e)))
+            raise AnsibleError("Invalid JSON response from %s: %s" % (url, to_native(e)))
+
+        if response.trace is not None:
+            response.trace.finish()
+
+        if received is not None:
+            self.store(url, 'GET', b''.join(received), response.headers)
+
+        return document
+
+    def next_page(self, url, headers, document):
+        """Return the URL of the page after url, or None on the last page."""
+
+        try:
+            return next_page_url(url, headers, document)
+        except ValueError as e:
+            raise AnsibleError(to_native(e))
+
+    def iter_pages(self, path='', fresh=False):
+        """Yield the pages of a list endpoint, following its pagination.
+
+        The next page is requested in the background while the caller
+        processes the current one. Endpoints without pagination yield a
+        single page.
+        """
+
+        executor = ThreadPoolExecutor(max_workers=1)
+
+        try:
+            pending = executor.submit(self.fetch_page, self.url(path), fresh)
+
+            while pending is not None:
+                items, next_url = pending.result()
+                pending = executor.submit(self.fetch_page, next_url, fresh) if next_url else None
+                yield items
+        finally:
+            executor.shutdown(wait=False)
+
+    def iter_items(self, path='', fresh=False):
+        """Yield the items of a list endpoint across all of its pages.
+
+        Each page is decoded from its chunks as they arrive, without a copy
+        of the raw body, and its items are yielded once it is complete. At
+        most the current and the prefetched page are held in memory.
+        """
+
+        for page in self.iter_pages(path, fresh):
+            for item in page:
+                yield item
+
+    def stats(self):
+        """Return the latency counters of the client's connection pool."""
+
+        return self.pool.stats.summary()
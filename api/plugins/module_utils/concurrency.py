@@ -0,0 +1,146 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def run_concurrently(func, items, max_concurrency=1):
+    """Call a function for every item using a bounded pool of threads.
+
+    Results are returned in the same order as the items regardless of the
+    order the calls complete in, so callers can merge them deterministically.
+
+    Parameters
+    ----------
+    func : callable
+        The function to call with each item
+    items : iterable
+        The items to process
+    max_concurrency : int, optional
+        The maximum number of calls in flight, 1 runs the calls serially
+
+    Returns
+    ----------
+    list
+        The result of each call, in item order
+    """
+
+    items = list(items)
+
+    if not max_concurrency or max_concurrency <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, len(items))) as executor:
+        return list(executor.map(func, items))
+
+
+def run_graph(func, tasks, max_concurrency=1):
+    """Call a function for every task once the tasks it requires have finished.
+
+    Tasks whose requirements are met run in parallel with up to
+    max_concurrency calls in flight. After a call fails no further tasks
+    are started, the calls already in flight finish and the first error is
+    raised.
+
+    Parameters
+    ----------
+    func : callable
+        The function to call with each task's value
+    tasks : dict
+        (value, requires) tuples keyed by task id, requires being a list of
+        the ids of the tasks that must finish first
+    max_concurrency : int, optional
+        The maximum number of calls in flight, 1 runs the calls serially
+
+    Returns
+    ----------
+    dict
+        The result of each call, keyed by task id
+
+    Raises
+    ----------
+    ValueError
+        Raised when a task requires an unknown task or the requirements form a cycle
+    """
+
+    waiting, dependents = task_graph(tasks)
+    limit = max(1, max_concurrency or 1)
+
+    # Start tasks in the order given, so a serial run is deterministic.
+    ready = [key for key in tasks if waiting[key] == 0]
+    results = {}
+    error = None
+
+    with ThreadPoolExecutor(max_workers=limit) as executor:
+        running = {}
+
+        while ready or running:
+            while ready and error is None and len(running) < limit:
+                key = ready.pop(0)
+                running[executor.submit(func, tasks[key][0])] = key
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                key = running.pop(future)
+
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+
+                ready.extend(release(key, waiting, dependents))
+
+    if error is not None:
+        raise error
+
+    if len(results) < len(tasks):
+        raise ValueError('Task requirements form a cycle: %s' % ', '.join(str(key) for key in tasks if key not in results))
+
+    return results
+
+
+def task_graph(tasks):
+    """Index the requirements of run_graph tasks.
+
+    Returns
+    ----------
+    tuple
+        The number of unfinished requirements of each task, and the ids of
+        the tasks requiring each task, both keyed by task id
+
+    Raises
+    ----------
+    ValueError
+        Raised when a task requires an unknown task
+    """
+
+    waiting = {}
+    dependents = dict((key, []) for key in tasks)
+
+    for key, (value, requires) in tasks.items():
+        requires = set(requires)
+        for required in requires:
+            if required not in tasks:
+                raise ValueError(f'Task {key} requires unknown task {required}')
+            dependents[required].append(key)
+        waiting[key] = len(requires)
+
+    return waiting, dependents
+
+
+def release(key, waiting, dependents):
+    """Mark a task finished, returning the ids of the tasks it leaves ready."""
+
+    ready = []
+
+    for dependent in dependents[key]:
+        waiting[dependent] -= 1
+        if waiting[dependent] == 0:
+            ready.append(dependent)
+
+    return ready
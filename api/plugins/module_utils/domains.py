@@ -0,0 +1,119 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+from ansible_collections.section.api.plugins.module_utils.concurrency import run_concurrently
+
+
+def domain_names(environment):
+    """Return the set of domain names attached to an environment record."""
+
+    return set(domain['name'] for domain in environment.get('domains') or [])
+
+
+def plan_domains(existing, hostnames, state='present', exclusive=False):
+    """Work out which domains to add to and remove from an environment.
+
+    Parameters
+    ----------
+    existing : set
+        The domain names the environment currently has
+    hostnames : list
+        The requested domain names
+    state : str, optional
+        present to add the hostnames, absent to remove them
+    exclusive : bool, optional
+        When state is present, also remove existing domains that are not requested
+
+    Returns
+    ----------
+    dict
+        The hostnames to add and remove, in request order then name order
+    """
+
+    requested = []
+    seen = set()
+    for hostname in hostnames:
+        if hostname not in seen:
+            seen.add(hostname)
+            requested.append(hostname)
+
+    if state == 'absent':
+        return {'add': [], 'remove': [hostname for hostname in requested if hostname in existing]}
+
+    return {
+        'add': [hostname for hostname in requested if hostname not in existing],
+        'remove': sorted(existing - seen) if exclusive else [],
+    }
+
+
+def apply_domains(client, name, plan, max_concurrency=1):
+    """Apply a domain plan to an environment.
+
+    Parameters
+    ----------
+    client : EnvClient
+        The client for the environment's application
+    name : str
+        The environment name
+    plan : dict
+        The plan returned by plan_domains
+    max_concurrency : int, optional
+        The maximum number of domain requests in flight
+
+    Returns
+    ----------
+    dict
+        The API response for each added and removed hostname
+    """
+
+    operations = [('add', hostname) for hostname in plan['add']]
+    operations += [('remove', hostname) for hostname in plan['remove']]
+
+    def apply(operation):
+        action, hostname = operation
+        if action == 'add':
+            return client.add_domain(name, hostname)
+        return client.delete_domain(name, hostname)
+
+    results = run_concurrently(apply, operations, max_concurrency)
+
+    applied = {'add': {}, 'remove': {}}
+    for (action, hostname), response in zip(operations, results):
+        applied[action][hostname] = response
+
+    return applied
+
+
+def domain_diff(existing, plan):
+    """Return the before and after domain lists of a plan, one name per line."""
+
+    after = (set(existing) | set(plan['add'])) - set(plan['remove'])
+
+    return {
+        'before': ''.join(f'{name}\n' for name in sorted(existing)),
+        'after': ''.join(f'{name}\n' for name in sorted(after)),
+    }
+
+
+def domain_result(plan, hostname=None, state='present', applied=None):
+    """Describe a domain plan, or the changes applied from it, as a task result.
+
+    With a single hostname it is Create, Remove or No change before the
+    plan is applied, then the API response for an added domain or the
+    removed hostname. With hostnames it is the plan, then the result of
+    apply_domains.
+    """
+
+    if not hostname:
+        return plan if applied is None else applied
+
+    if applied is None:
+        if state == 'present':
+            return "Create" if plan['add'] else "No change"
+        return "Remove" if plan['remove'] else "No change"
+
+    if plan['add']:
+        return applied['add'][hostname]
+    if plan['remove']:
+        return hostname
+    return {}
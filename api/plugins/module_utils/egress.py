@@ -0,0 +1,145 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+from ansible_collections.section.api.plugins.module_utils.concurrency import run_concurrently
+
+DEFAULT_REMOVE_HEADERS = ['section-io-id']
+
+
+def normalise_spec(spec, remove_headers=None):
+    """Normalise an environment's desired egress.
+
+    A spec is either an address for the default origin, or a dict with an
+    origins mapping of origin name to address (or to a dict with an
+    address) and an optional remove_headers list. Specs without
+    remove_headers use the given list, or DEFAULT_REMOVE_HEADERS.
+
+    Returns
+    ----------
+    dict
+        The desired remove_headers list and origins mapping of name to address
+    """
+
+    if not isinstance(spec, dict):
+        spec = {'origins': {'default': spec}}
+
+    origins = {}
+    for name, origin in (spec.get('origins') or {}).items():
+        origins[name] = origin.get('address') if isinstance(origin, dict) else origin
+
+    remove_headers = spec.get('remove_headers') or remove_headers or DEFAULT_REMOVE_HEADERS
+    if not isinstance(remove_headers, list):
+        remove_headers = [remove_headers]
+
+    return {'remove_headers': remove_headers, 'origins': origins}
+
+
+def egress_diff(current, desired):
+    """Compare an environment's egress configuration with its desired spec.
+
+    Parameters
+    ----------
+    current : dict
+        The configuration returned by EnvClient.list_egress
+    desired : dict
+        A spec returned by normalise_spec
+
+    Returns
+    ----------
+    dict
+        The before and after values of each setting that differs, empty when
+        the environment is up to date
+    """
+
+    diff = {}
+
+    before_headers = current.get('remove_request_headers') or []
+    if set(before_headers) != set(desired['remove_headers']):
+        diff['remove_request_headers'] = {'before': before_headers, 'after': desired['remove_headers']}
+
+    current_origins = current.get('origins') or {}
+    for name, address in desired['origins'].items():
+        before = (current_origins.get(name) or {}).get('address')
+        if before != address:
+            diff.setdefault('origins', {})[name] = {'before': before, 'after': address}
+
+    return diff
+
+
+def merge_origins(current, desired):
+    """Return the origins to send for a desired spec.
+
+    The API replaces the whole origins object, so the current origins the
+    spec does not name are sent back unchanged instead of being deleted.
+
+    Parameters
+    ----------
+    current : dict
+        The configuration returned by EnvClient.list_egress
+    desired : dict
+        A spec returned by normalise_spec
+
+    Returns
+    ----------
+    dict
+        The origin settings keyed by origin name
+    """
+
+    origins = dict((name, dict(origin)) for name, origin in (current.get('origins') or {}).items())
+
+    for name, address in desired['origins'].items():
+        origins[name] = dict(origins.get(name) or {}, address=address)
+
+    return origins
+
+
+def reconcile_egress(client, specs, max_concurrency=4, check_mode=False, remove_headers=None, known=None):
+    """Bring the egress of many environments in line with their specs.
+
+    The current configurations are fetched concurrently and only the
+    environments that differ are updated, again concurrently. Origins a
+    spec does not name are kept.
+
+    Parameters
+    ----------
+    client : EnvClient
+        The client for the environments' application
+    specs : dict
+        The desired spec of each environment, keyed by environment name
+    max_concurrency : int, optional
+        The maximum number of requests in flight
+    check_mode : bool, optional
+        Work out the changes without applying them
+    remove_headers : list, optional
+        The headers to remove for specs that do not list their own
+    known : dict, optional
+        Current configurations already known, eg. prefetched by the
+        inventory, keyed by environment name. They are not fetched again.
+
+    Returns
+    ----------
+    dict
+        changed, skipped and diff for each environment, keyed by name
+    """
+
+    names = list(specs)
+    desired = dict((name, normalise_spec(specs[name], remove_headers)) for name in names)
+
+    known = known or {}
+    fetched = iter(run_concurrently(client.list_egress, [name for name in names if name not in known], max_concurrency))
+    currents = dict((name, known[name] if name in known else next(fetched)) for name in names)
+    diffs = dict((name, egress_diff(currents[name], desired[name])) for name in names)
+
+    changed = [name for name in names if diffs[name]]
+
+    if not check_mode:
+        run_concurrently(
+            lambda name: client.set_egress(name, merge_origins(currents[name], desired[name]), desired[name]['remove_headers']),
+            changed,
+            max_concurrency
+        )
+
+    return dict(
+        (name, {'changed': bool(diffs[name]), 'skipped': not diffs[name], 'diff': diffs[name]})
+        for name in names
+    )
@@ -0,0 +1,116 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import sys
+
+from ansible_collections.section.api.plugins.module_utils.prefetch import PREFETCH_VAR
+
+
+class HostRecord:
+    """An environment host and the names of the groups it belongs to.
+
+    Group names are interned and domain lists are shared between hosts with
+    the same domains, so large inventories hold one copy of each.
+    """
+
+    __slots__ = ('name', 'branch', 'app_id', 'app_name', 'section_id', 'account_name', 'domains', 'prefetched', 'prefetch')
+
+    def __init__(self, name, branch, app_id, app_name, section_id, account_name, domains=None, prefetched=None, prefetch=None):
+        self.name = name
+        self.branch = branch
+        self.app_id = app_id
+        self.app_name = app_name
+        self.section_id = section_id
+        self.account_name = account_name
+        self.domains = domains
+        self.prefetched = prefetched
+        self.prefetch = prefetch
+
+    def hostvars(self):
+        """Return the host's variables in the order they are set."""
+
+        hostvars = {
+            'branch': self.branch,
+            'id': self.app_id,
+            'name': self.app_name,
+            'section_id': self.section_id,
+        }
+
+        if self.domains is not None:
+            hostvars['domains'] = self.domains
+
+        if self.prefetched:
+            hostvars.update(self.prefetched)
+
+        if self.prefetch:
+            hostvars[PREFETCH_VAR] = self.prefetch
+
+        return hostvars
+
+
+class InventoryModel:
+    """A compact model of the hosts and groups built from account trees.
+
+    Groups are indexed in the order they are first seen, so emitting the
+    model adds each group once and in the same order as walking the
+    account trees directly.
+    """
+
+    __slots__ = ('groups', 'hosts', '_domains')
+
+    def __init__(self):
+        self.groups = {}
+        self.hosts = []
+        self._domains = {}
+
+    def group(self, name):
+        """Intern a group name and add it to the group index."""
+
+        interned = self.groups.get(name)
+
+        if interned is None:
+            interned = self.groups[name] = sys.intern(name)
+
+        return interned
+
+    def domains(self, domains):
+        """Return a shared copy of a domain list."""
+
+        key = tuple(domains)
+        shared = self._domains.get(key)
+
+        if shared is None:
+            shared = self._domains[key] = list(key)
+
+        return shared
+
+    def add_accounts(self, accounts):
+        """Add the hosts of a fetched account tree to the model."""
+
+        for account in accounts:
+            sid = account['id']
+            account_name = self.group(account['name'])
+
+            for application in account['applications']:
+                app_id = application['id']
+                app_name = self.group(application['name'])
+
+                for environment in application['environments']:
+                    branch = self.group(environment['name'])
+                    domains = environment.get('domains')
+                    prefetched = environment.get('prefetched')
+                    prefetch = environment.get('prefetch')
+
+                    self.hosts.append(HostRecord(
+                        f'{sid}-{app_name}-{branch}',
+                        branch,
+                        app_id,
+                        app_name,
+                        sid,
+                        account_name,
+                        None if domains is None else self.domains(domains),
+                        prefetched,
+                        prefetch,
+                    ))
+
+        return self
@@ -0,0 +1,128 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import codecs
+import json
+
+_WHITESPACE = ' \t\n\r'
+_DELIMITERS = _WHITESPACE + ',]'
+
+
+def load_json(chunks):
+    """Decode a JSON document from byte chunks.
+
+    Arrays are decoded item by item as the chunks arrive, so the raw body
+    is never joined into one string, any other document is decoded in one
+    go. Malformed documents raise ValueError like json.loads.
+
+    Returns
+    ----------
+    list|dict|str|int|float|bool|None
+        The decoded document
+    """
+
+    items = []
+
+    for is_item, value in _decode(chunks):
+        if not is_item:
+            return value
+        items.append(value)
+
+    return items
+
+
+class _Reader:
+    """A text buffer over byte chunks, refilled as values are decoded."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.text = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.index = 0
+        self.eof = False
+
+    def fill(self):
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            data, self.eof = self.text.decode(b'', final=True), True
+        else:
+            data = self.text.decode(chunk)
+        self.buffer = self.buffer[self.index:] + data
+        self.index = 0
+
+    def peek(self):
+        """Skip whitespace and return the next character, '' at the end."""
+
+        while True:
+            while self.index < len(self.buffer) and self.buffer[self.index] in _WHITESPACE:
+                self.index += 1
+            if self.index < len(self.buffer):
+                return self.buffer[self.index]
+            if self.eof:
+                return ''
+            self.fill()
+
+    def rest(self):
+        """Return everything that is left of the document."""
+
+        while not self.eof:
+            self.fill()
+        return self.buffer[self.index:]
+
+    def value(self, decoder):
+        """Decode the value after any whitespace at the current position."""
+
+        self.peek()
+
+        while True:
+            try:
+                item, end = decoder.raw_decode(self.buffer, self.index)
+            except ValueError:
+                if self.eof:
+                    raise
+                self.fill()
+                continue
+
+            if not self.eof and not isinstance(item, (dict, list, str)) and (
+                    end == len(self.buffer) or self.buffer[end] not in _DELIMITERS):
+                # A number may continue in the next chunk, eg. 4 of 45 or 4. of 4.5
+                self.fill()
+                continue
+
+            self.index = end
+            return item
+
+
+def _decode(chunks):
+    """Yield (True, item) for each item of an array, or (False, document)."""
+
+    decoder = json.JSONDecoder()
+    reader = _Reader(chunks)
+
+    first = reader.peek()
+    if not first:
+        raise ValueError('Expecting a JSON document, got an empty response')
+
+    if first != '[':
+        # Not an array, decode the whole document.
+        yield False, json.loads(reader.rest())
+        return
+
+    reader.index += 1
+    separator = ','
+
+    if reader.peek() == ']':
+        reader.index += 1
+        separator = ']'
+
+    while separator == ',':
+        yield True, reader.value(decoder)
+
+        separator = reader.peek()
+        if separator not in (',', ']'):
+            raise ValueError('Unterminated JSON array' if not separator else
+                             f"Expecting ',' or ']' in JSON array, got {separator!r}")
+        reader.index += 1
+
+    if reader.peek():
+        raise ValueError('Extra data after the JSON array')
@@ -0,0 +1,333 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import atexit
+import binascii
+import json
+import math
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing import util as multiprocessing_util
+
+from ansible.module_utils.six.moves.urllib.parse import urlparse
+
+# Path segments that are followed by an identifier, and the placeholder the
+# identifier is replaced with in endpoint templates.
+PARAMETERS = {
+    'account': '{account}',
+    'application': '{application}',
+    'environment': '{environment}',
+    'domain': '{hostname}',
+    'proxy': '{proxy}',
+}
+
+PERCENTILES = (50, 95, 99)
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def endpoint_template(url):
+    """Return the path of a URL with its identifiers replaced by placeholders.
+
+    eg. /api/v1/account/1/application/2/environment/Production/egress becomes
+    /api/v1/account/{account}/application/{application}/environment/{environment}/egress
+    """
+
+    segments = urlparse(url).path.rstrip('/').split('/')
+
+    for index in range(1, len(segments)):
+        placeholder = PARAMETERS.get(segments[index - 1])
+        if placeholder and segments[index] not in PARAMETERS:
+            segments[index] = placeholder
+
+    return '/'.join(segments) or '/'
+
+
+def percentile(values, percent):
+    """Return the nearest-rank percentile of a sorted list."""
+
+    if not values:
+        return 0.0
+
+    rank = int(math.ceil(percent / 100.0 * len(values)))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+class RequestTrace:
+    """The timings of one API request, across any retries.
+
+    connect, tls, ttfb and body are the phases of the final attempt in
+    seconds. connect and tls are 0 when a keep-alive connection was reused.
+    """
+
+    def __init__(self, metrics, method, url):
+        self.metrics = metrics
+        self.method = method
+        self.url = url
+        self.template = endpoint_template(url)
+        self.start_time = time.time()
+        self.duration = None
+        self.connect = 0.0
+        self.tls = 0.0
+        self.ttfb = 0.0
+        self.body = 0.0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.status = None
+        self.retries = 0
+        self.reused = False
+        self.error = None
+        self._start = time.perf_counter()
+
+    @property
+    def name(self):
+        return f'{self.method} {self.template}'
+
+    def finish(self, error=None):
+        """Record the request, once, with the metrics it was started from."""
+
+        if self.duration is not None:
+            return
+
+        self.duration = time.perf_counter() - self._start
+        self.error = error
+        self.metrics.record(self)
+
+
+class EndpointStats:
+    """Aggregated timings of the requests to one endpoint template."""
+
+    def __init__(self):
+        self.durations = []
+        self.connect = 0.0
+        self.tls = 0.0
+        self.ttfb = 0.0
+        self.body = 0.0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.retries = 0
+        self.errors = 0
+        self.reused = 0
+        self.statuses = {}
+
+    def add(self, trace):
+        self.durations.append(trace.duration)
+        self.connect += trace.connect
+        self.tls += trace.tls
+        self.ttfb += trace.ttfb
+        self.body += trace.body
+        self.bytes_out += trace.bytes_out
+        self.bytes_in += trace.bytes_in
+        self.retries += trace.retries
+        self.errors += 1 if trace.error is not None else 0
+        self.reused += 1 if trace.reused else 0
+
+        status = str(trace.status) if trace.status is not None else 'error'
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def summary(self):
+        count = len(self.durations)
+        durations = sorted(self.durations)
+
+        summary = {
+            'requests': count,
+            'errors': self.errors,
+            'retries': self.retries,
+            'reused_connections': self.reused,
+            'statuses': dict(self.statuses),
+            'bytes_out': self.bytes_out,
+            'bytes_in': self.bytes_in,
+            'total_time': sum(durations),
+            'mean_connect': self.connect / count,
+            'mean_tls': self.tls / count,
+            'mean_ttfb': self.ttfb / count,
+            'mean_body': self.body / count,
+            'max': durations[-1],
+        }
+
+        for percent in PERCENTILES:
+            summary[f'p{percent}'] = percentile(durations, percent)
+
+        return summary
+
+
+class JsonSummarySink:
+    """Write the per-endpoint summary as JSON when the metrics are closed.
+
+    Worker processes, eg. those running action plugins, write their own
+    summary next to the configured path, with their process id before the
+    file extension.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def span(self, trace):
+        pass
+
+    def close(self, summary):
+        path = self.path
+        if multiprocessing.parent_process() is not None:
+            root, ext = os.path.splitext(path)
+            path = f'{root}.{os.getpid()}{ext}'
+
+        with open(path, 'w') as handle:
+            json.dump(summary, handle, indent=2, sort_keys=True)
+            handle.write('\n')
+
+
+class SpanFileSink:
+    """Append an OpenTelemetry style span per request to a JSON lines file.
+
+    Each line is written with a single append, so several processes can
+    share one file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.trace_id = binascii.hexlify(os.urandom(16)).decode('ascii')
+        self._lock = threading.Lock()
+
+    def span(self, trace):
+        start = int(trace.start_time * 1e9)
+        end = start + int(trace.duration * 1e9)
+
+        attributes = {
+            'http.request.method': trace.method,
+            'url.full': trace.url,
+            'url.template': trace.template,
+            'http.request.body.size': trace.bytes_out,
+            'http.response.body.size': trace.bytes_in,
+            'http.request.resend_count': trace.retries,
+            'section.connection.reused': trace.reused,
+            'section.time.connect': trace.connect,
+            'section.time.tls': trace.tls,
+            'section.time.ttfb': trace.ttfb,
+            'section.time.body': trace.body,
+        }
+
+        if trace.status is not None:
+            attributes['http.response.status_code'] = trace.status
+
+        span = {
+            'traceId': self.trace_id,
+            'spanId': binascii.hexlify(os.urandom(8)).decode('ascii'),
+            'name': trace.name,
+            'kind': 'SPAN_KIND_CLIENT',
+            'startTimeUnixNano': start,
+            'endTimeUnixNano': end,
+            'attributes': attributes,
+            'status': {'code': 'STATUS_CODE_ERROR', 'message': trace.error} if trace.error else {'code': 'STATUS_CODE_UNSET'},
+        }
+
+        line = json.dumps(span, sort_keys=True) + '\n'
+
+        with self._lock:
+            with open(self.path, 'a') as handle:
+                handle.write(line)
+
+    def close(self, summary):
+        pass
+
+
+class RequestMetrics:
+    """Thread-safe per-endpoint request metrics with pluggable sinks.
+
+    A sink has a span(trace) method, called as each request finishes, and
+    a close(summary) method, called with the summary at the end of the run.
+
+    Parameters
+    ----------
+    sinks : list, optional
+        The sinks to send spans and the summary to
+    """
+
+    def __init__(self, sinks=None):
+        self.sinks = list(sinks or [])
+        self.pid = os.getpid()
+        self._endpoints = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def start(self, method, url):
+        """Start timing a request."""
+
+        return RequestTrace(self, method, url)
+
+    def record(self, trace):
+        with self._lock:
+            stats = self._endpoints.get(trace.name)
+            if stats is None:
+                stats = self._endpoints[trace.name] = EndpointStats()
+            stats.add(trace)
+
+        for sink in self.sinks:
+            sink.span(trace)
+
+    def summary(self):
+        """Return the metrics of every endpoint template, keyed by method and template."""
+
+        with self._lock:
+            endpoints = dict((name, stats.summary()) for name, stats in self._endpoints.items())
+
+        return {
+            'requests': sum(endpoint['requests'] for endpoint in endpoints.values()),
+            'endpoints': endpoints,
+        }
+
+    def close(self):
+        """Send the summary to every sink, once."""
+
+        if self._closed:
+            return
+
+        self._closed = True
+        summary = self.summary()
+
+        for sink in self.sinks:
+            sink.close(summary)
+
+
+def get_metrics(settings=None):
+    """Return the request metrics shared by every client in this process.
+
+    Metrics are opt-in. Settings are read from the client's metrics option,
+    a dict with summary_file and trace_file keys, falling back to the
+    SECTION_API_METRICS_FILE and SECTION_API_TRACE_FILE environment
+    variables. The summary is written when the process exits.
+
+    Returns
+    ----------
+    RequestMetrics|None
+        The metrics to record requests with, None when they are disabled
+    """
+
+    global _metrics
+
+    settings = settings if isinstance(settings, dict) else {}
+    summary_file = settings.get('summary_file') or os.environ.get('SECTION_API_METRICS_FILE')
+    trace_file = settings.get('trace_file') or os.environ.get('SECTION_API_TRACE_FILE')
+
+    with _metrics_lock:
+        if _metrics is not None and _metrics.pid == os.getpid():
+            return _metrics
+
+        if not summary_file and not trace_file:
+            return None
+
+        sinks = []
+        if summary_file:
+            sinks.append(JsonSummarySink(summary_file))
+        if trace_file:
+            sinks.append(SpanFileSink(trace_file))
+
+        _metrics = RequestMetrics(sinks)
+
+        # Forked multiprocessing workers skip atexit but run finalizers.
+        atexit.register(_metrics.close)
+        multiprocessing_util.Finalize(_metrics, _metrics.close, exitpriority=10)
+
+        return _metrics
@@ -0,0 +1,170 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import base64
+import json
+import os
+import ssl
+
+from ansible.module_utils.six.moves import http_client
+from ansible.module_utils.six.moves.urllib.error import HTTPError, URLError
+from ansible.module_utils.urls import ConnectionError, Request, SSLValidationError
+from ansible.module_utils._text import to_native
+from ansible_collections.section.api.plugins.module_utils.pagination import next_page_url, page_items
+from ansible_collections.section.api.plugins.module_utils.resources import EnvironmentResource, ProxyResource
+from ansible_collections.section.api.plugins.module_utils.scheduler import DEFAULT_RETRIES, RequestScheduler
+
+# Modules run on the target, so this client only uses the standard library
+# and ansible.module_utils. Keep controller code such as ansible.errors,
+# ansible.utils and client.py out of its imports, AnsiballZ ships every
+# module_utils file it imports to the target with each task.
+
+DEFAULT_ENDPOINT = 'https://aperture.section.io/api/v1'
+
+# Methods whose requests carry a JSON body, others are sent without one.
+BODY_METHODS = ('POST', 'PUT', 'PATCH')
+
+
+class ApiError(Exception):
+    """An API request failed, modules report it with fail_json."""
+
+    def __init__(self, message, status=None):
+        super(ApiError, self).__init__(message)
+        self.status = status
+
+
+class ModuleClient:
+    """A client for modules, with no controller-side dependencies.
+
+    It has the request and iter_items methods of Client. Requests are sent
+    with ansible.module_utils.urls, which honours the proxy environment
+    variables and validate_certs, and are retried by a RequestScheduler
+    with the same rules as Client. Failed requests raise ApiError, modules
+    catch it and call fail_json.
+
+    Parameters
+    ----------
+    username : str
+        The account name to authenticate with the API
+    password : str
+        The password (or token) to authenticate with the API
+    options : dict, optional
+        headers, timeout, validate_certs, rate_limits and retries
+    """
+
+    def __init__(self, username, password, options=None):
+        if options is None:
+            options = {}
+
+        if not isinstance(options, dict):
+            raise ApiError("Expecting client options to be dict.")
+
+        self.options = dict(options)
+        self.options['endpoint'] = os.getenv('SECTION_IO_ENDPOINT') or DEFAULT_ENDPOINT
+        self.options['base_path'] = ''
+
+        if not isinstance(self.options.get('headers') or {}, dict):
+            raise ApiError("Expecting client headers to be dict.")
+
+        credentials = f'{username}:{password}'.encode('utf-8')
+
+        headers = dict(self.options.get('headers') or {})
+        headers['Content-Type'] = 'application/json'
+        headers['Authorization'] = 'Basic %s' % base64.b64encode(credentials).decode('ascii')
+
+        self.http = Request(
+            headers=headers,
+            validate_certs=self.options.get('validate_certs', False),
+            timeout=self.options.get('timeout', 30),
+        )
+
+        retries = self.options.get('retries')
+        self.scheduler = RequestScheduler(
+            retries=DEFAULT_RETRIES if retries is None else retries,
+            rate_limits=self.options.get('rate_limits'),
+        )
+
+    def url(self, path=''):
+        if path.startswith(('http://', 'https://')):
+            return path
+
+        endpoint = self.options.get('endpoint')
+        base_path = self.options.get('base_path').lstrip('/')
+
+        path = path.lstrip('/')
+
+        return f'{endpoint}/{base_path}/{path}' if len(base_path) > 0 else f'{endpoint}/{path}'
+
+    def send(self, url, method='GET', payload={}):
+        """Send a request, retrying transient failures.
+
+        Returns
+        ----------
+        tuple
+            The response and its body
+
+        Raises
+        ----------
+        ApiError
+            Raised when the request fails after any retries
+        """
+
+        data = json.dumps(payload) if method in BODY_METHODS else None
+
+        def send():
+            try:
+                response = self.http.open(method, url, data=data)
+                return response, response.read()
+            except HTTPError:
+                raise
+            except (URLError, OSError, http_client.HTTPException) as e:
+                # The scheduler never retries certificate failures, and only
+                # retries other connection failures of idempotent methods.
+                if isinstance(getattr(e, 'reason', e), ssl.SSLError):
+                    raise SSLValidationError(to_native(e))
+                raise ConnectionError(to_native(e))
+
+        try:
+            return self.scheduler.call(method, url, send)
+        except HTTPError as e:
+            raise ApiError("Received HTTP error: %s" % to_native(e), e.code)
+        except ConnectionError as e:
+            raise ApiError("Error connecting: %s" % to_native(e))
+
+    def request(self, path='', method='GET', payload={}, fresh=False):
+        response, body = self.send(self.url(path), method, payload)
+        return json.loads(body)
+
+    def iter_items(self, path='', fresh=False):
+        """Yield the items of a list endpoint across all of its pages.
+
+        Responses are never cached here, fresh is accepted for the resources.
+        """
+
+        url = self.url(path)
+
+        while url:
+            response, body = self.send(url)
+            document = json.loads(body)
+
+            for item in page_items(document):
+                yield item
+
+            try:
+                url = next_page_url(url, response.headers, document)
+            except ValueError as e:
+                raise ApiError(to_native(e))
+
+
+class ModuleEnvClient(EnvironmentResource, ModuleClient):
+
+    def __init__(self, account, application, username, password, options=None):
+        ModuleClient.__init__(self, username=username, password=password, options=options)
+        self.options['base_path'] = f'/account/{account}/application/{application}/environment'
+
+
+class ModuleProxyClient(ProxyResource, ModuleClient):
+
+    def __init__(self, account, application, username, password, options=None):
+        ModuleClient.__init__(self, username=username, password=password, options=options)
+        self.options['base_path'] = f'/account/{account}/application/{application}/environment'
@@ -0,0 +1,101 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import re
+
+from ansible.module_utils.six.moves.urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+
+# Keys a paginated document may keep its items under.
+ITEM_KEYS = ('items', 'data', 'results')
+
+_LINK_NEXT = re.compile(r'<([^>]+)>\s*;\s*rel="?next"?')
+
+
+def page_items(document):
+    """Return the items of a page document.
+
+    A plain list is a page by itself, otherwise the list under one of
+    ITEM_KEYS is used. Any other document is treated as a single item.
+    """
+
+    if isinstance(document, list):
+        return document
+
+    if isinstance(document, dict):
+        for key in ITEM_KEYS:
+            if isinstance(document.get(key), list):
+                return document[key]
+
+    return [document]
+
+
+def with_cursor(url, cursor):
+    """Return url with its cursor query parameter set."""
+
+    parsed = urlparse(url)
+    query = [(key, value) for key, value in parse_qsl(parsed.query) if key != 'cursor']
+    query.append(('cursor', cursor))
+    return urlunparse(parsed._replace(query=urlencode(query)))
+
+
+def same_origin(url, following):
+    """Resolve a next link against url, refusing links to another origin.
+
+    Requests carry the API credentials, so pagination must never lead
+    them to a different scheme, host or port.
+
+    Raises
+    ----------
+    ValueError
+        Raised when the link points outside the origin of url
+    """
+
+    following = urljoin(url, following)
+    current, parsed = urlparse(url), urlparse(following)
+
+    if (parsed.scheme, parsed.netloc) != (current.scheme, current.netloc):
+        raise ValueError(f'Refusing to follow the next page link to {following}, '
+                         f'it is outside {current.scheme}://{current.netloc}')
+
+    return following
+
+
+def next_page_url(url, headers=None, document=None):
+    """Find the URL of the page after url.
+
+    Looks for, in order, a Link header with rel="next", a next URL in the
+    document (next, links.next or _links.next.href) and a next_cursor
+    value, which is sent back as the cursor query parameter.
+
+    Returns
+    ----------
+    str|None
+        The absolute URL of the next page, None on the last page
+
+    Raises
+    ----------
+    ValueError
+        Raised when the next page is on another origin than url
+    """
+
+    link = headers.get('Link') if headers is not None else None
+    if link:
+        match = _LINK_NEXT.search(link)
+        if match:
+            return same_origin(url, match.group(1))
+
+    if not isinstance(document, dict):
+        return None
+
+    links = document.get('links') or {}
+    hal = (document.get('_links') or {}).get('next') or {}
+    following = document.get('next') or links.get('next') or hal.get('href')
+
+    if isinstance(following, str) and following:
+        return same_origin(url, following)
+
+    cursor = document.get('next_cursor')
+    if cursor:
+        return with_cursor(url, cursor)
+
+    return None
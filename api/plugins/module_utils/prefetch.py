@@ -0,0 +1,112 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import uuid
+
+from ansible_collections.section.api.plugins.module_utils.concurrency import run_concurrently
+
+# The environment sub-resources the inventory can prefetch into hostvars, and
+# their paths below the environment.
+PREFETCH_PATHS = {
+    'egress': '/egress',
+    'proxy_config': '/proxy/varnish/configuration',
+}
+
+# The kinds the inventory can prefetch, domains come with the environments
+# listing and cost no extra request.
+PREFETCH_KINDS = ('domains',) + tuple(PREFETCH_PATHS)
+
+# Identifies this controller process. Forked task workers share it, so the
+# hostvars of a previous run, loaded from the inventory cache, never match.
+RUN_ID = uuid.uuid4().hex
+
+# The hostvar the inventory sets to the kinds it fetched on this run, and the
+# fact actions set to the kinds they changed since.
+PREFETCH_VAR = 'section_prefetch'
+STALE_VAR = 'section_prefetch_stale'
+
+
+def prefetch_environments(client, targets, kinds, max_concurrency=1):
+    """Fetch the sub-resources of many environments concurrently.
+
+    Parameters
+    ----------
+    client : Client
+        A client for the credentials the environments belong to
+    targets : list
+        (account id, application id, environment name) tuples
+    kinds : list
+        The sub-resources to fetch, keys of PREFETCH_PATHS
+    max_concurrency : int, optional
+        The maximum number of requests in flight
+
+    Returns
+    ----------
+    list
+        A dict of each target's sub-resources keyed by kind, in the order given
+    """
+
+    requests = [(target, kind) for target in targets for kind in kinds]
+
+    def fetch(request):
+        (account, application, environment), kind = request
+        return client.request(f'/account/{account}/application/{application}/environment/{environment}{PREFETCH_PATHS[kind]}')
+
+    responses = iter(run_concurrently(fetch, requests, max_concurrency))
+
+    return [dict((kind, next(responses)) for kind in kinds) for _ in targets]
+
+
+def prefetch_marker(kinds):
+    """Return the PREFETCH_VAR hostvar of environments fetched on this run."""
+
+    return {'run': RUN_ID, 'kinds': list(kinds)}
+
+
+def this_run(marker):
+    """Return the kinds of a PREFETCH_VAR or STALE_VAR marker set on this run."""
+
+    if not isinstance(marker, dict) or marker.get('run') != RUN_ID:
+        return []
+
+    return list(marker.get('kinds') or [])
+
+
+def prefetched(task_vars, kind, account, application, environment):
+    """Return a sub-resource the inventory prefetched into a host's vars.
+
+    The hostvars are only used when the inventory fetched them on this run,
+    no task has changed them since, and the host is the environment being
+    managed, ie. its section_id, id and branch match.
+
+    Returns
+    ----------
+    dict|None
+        The prefetched sub-resource, None when it must be fetched
+    """
+
+    if kind not in this_run(task_vars.get(PREFETCH_VAR)) or kind in this_run(task_vars.get(STALE_VAR)):
+        return None
+
+    if task_vars.get(kind) is None:
+        return None
+
+    host = (str(task_vars.get('section_id')), str(task_vars.get('id')), task_vars.get('branch'))
+    if host != (str(account), str(application), environment):
+        return None
+
+    return task_vars[kind]
+
+
+def mark_stale(task_vars, kind):
+    """Return the ansible_facts that stop later tasks of this run using a prefetched kind.
+
+    The fact only names the run and kinds, so it is ignored by later runs
+    when a fact cache keeps it, unlike facts shadowing the hostvars would be.
+    """
+
+    kinds = this_run(task_vars.get(STALE_VAR))
+    if kind not in kinds:
+        kinds.append(kind)
+
+    return {STALE_VAR: {'run': RUN_ID, 'kinds': kinds}}
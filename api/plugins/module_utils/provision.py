@@ -0,0 +1,143 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import time
+
+from ansible.errors import AnsibleError
+from ansible_collections.section.api.plugins.module_utils.concurrency import run_concurrently
+from ansible_collections.section.api.plugins.module_utils.domains import domain_names
+
+DEFAULT_TIMEOUT = 300
+DEFAULT_POLL_INTERVAL = 1.0
+MAX_POLL_INTERVAL = 15.0
+
+
+def usable(environment, domain):
+    """Whether a listed environment is ready, ie. its domain is attached."""
+
+    return domain in domain_names(environment)
+
+
+def provision_environments(client, environments, source, wait=True, timeout=DEFAULT_TIMEOUT,
+                           poll_interval=DEFAULT_POLL_INTERVAL, max_concurrency=4, check_mode=False):
+    """Create environments from a source environment in parallel.
+
+    One listing call finds the environments that already exist, they are
+    skipped. The others are created concurrently, then wait_until_usable
+    polls the listing until each is usable.
+
+    Parameters
+    ----------
+    client : EnvClient
+        The client for the environments' application
+    environments : dict
+        The domain of each environment to create, keyed by name
+    source : str
+        The environment to copy
+    wait : bool, optional
+        Poll until every created environment is usable
+    timeout : float, optional
+        How many seconds to wait for the environments
+    poll_interval : float, optional
+        The first delay between polls
+    max_concurrency : int, optional
+        The maximum number of create requests in flight
+    check_mode : bool, optional
+        Work out which environments would be created without creating them
+
+    Returns
+    ----------
+    dict
+        changed and skipped for each environment keyed by name, and for
+        those created their response, submit_time and, when waiting, ready,
+        latency, the seconds from the create request until it was usable,
+        and polls
+
+    Raises
+    ----------
+    AnsibleError
+        Raised when the source environment does not exist or an API request fails
+    """
+
+    existing = dict((environment['environment_name'], environment) for environment in client.all())
+
+    if source not in existing:
+        raise AnsibleError(f"Source environment '{source}' does not exist")
+
+    results = dict((name, {'changed': name not in existing, 'skipped': name in existing}) for name in environments)
+    missing = [name for name in environments if name not in existing]
+
+    if check_mode or not missing:
+        return results
+
+    def create(name):
+        started = time.time()
+        results[name]['result'] = client.create(name, source, environments[name])
+        results[name]['submit_time'] = time.time() - started
+        return started
+
+    started = dict(zip(missing, run_concurrently(create, missing, max_concurrency)))
+
+    if not wait:
+        return results
+
+    waited = wait_until_usable(client, dict((name, environments[name]) for name in missing), started, timeout, poll_interval)
+
+    for name, status in waited.items():
+        results[name].update(status)
+
+    return results
+
+
+def wait_until_usable(client, environments, started, timeout=DEFAULT_TIMEOUT, poll_interval=DEFAULT_POLL_INTERVAL):
+    """Poll the environments listing until each environment is usable.
+
+    The listing is fetched fresh, backing off up to MAX_POLL_INTERVAL.
+
+    Parameters
+    ----------
+    client : EnvClient
+        The client for the environments' application
+    environments : dict
+        The domain of each environment to wait for, keyed by name
+    started : dict
+        When each environment's create request was sent, keyed by name
+    timeout : float, optional
+        How many seconds to wait for the environments
+    poll_interval : float, optional
+        The first delay between polls
+
+    Returns
+    ----------
+    dict
+        ready, polls and, when ready, latency, the seconds from the create
+        request until it was usable, for each environment keyed by name
+    """
+
+    results = dict((name, {}) for name in environments)
+    start = time.time()
+    pending = list(environments)
+    polls = 0
+    delay = poll_interval
+
+    while pending:
+        listing = dict((environment['environment_name'], environment) for environment in client.all(fresh=True))
+        polls += 1
+        now = time.time()
+
+        for name in pending:
+            if name in listing and usable(listing[name], environments[name]):
+                results[name] = {'ready': True, 'latency': now - started[name], 'polls': polls}
+
+        pending = [name for name in pending if not results[name].get('ready')]
+
+        if not pending or now - start + delay > timeout:
+            break
+
+        time.sleep(delay)
+        delay = min(delay * 2, MAX_POLL_INTERVAL)
+
+    for name in pending:
+        results[name] = {'ready': False, 'polls': polls}
+
+    return results
@@ -0,0 +1,126 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+from ansible.module_utils.six.moves.urllib.parse import quote
+
+
+class EnvironmentResource:
+    """The environment endpoints of an application.
+
+    Mixed into a client whose base path is an application's environment
+    collection, eg. EnvClient on the controller and ModuleEnvClient in
+    modules. Only the client's request and iter_items methods are used.
+    """
+
+    def all(self, fresh=False):
+        return list(self.iter_items(fresh=fresh))
+
+    def get(self, name):
+        return self.request(f'/{name}')
+
+    def create(self, name, source_environment_name, domain_name):
+        return self.request(method='POST', payload={
+            'name': name,
+            'source_environment_name': source_environment_name,
+            'domain_name': domain_name
+        })
+
+    def add_domain(self, name, hostname):
+        return self.request(f'/{name}/domain/{hostname}', 'POST')
+
+    def delete_domain(self, name, hostname):
+        return self.request(f'/{name}/domain/{hostname}', 'DELETE')
+
+    def list_egress(self, name):
+        """List egress configuration for an environment
+
+        Parameters
+        ----------
+        name : str
+          The environment name
+        """
+
+        return self.request(method="GET", path=f"/{name}/egress")
+
+    def update_egress(self, name, egress, egress_name='default', remove_headers=list()):
+        """ Updates an environments default egress.
+
+        Parameters
+        ----------
+        name : str
+            The environment name
+        egress : str
+            The egress hostname
+        egress_name : str, optional
+            The egress name as seen in Sections UI
+        remove_headers : list, optional
+            A list of headers to remove from incoming requests
+        """
+        return self.set_egress(name, {egress_name: egress}, remove_headers)
+
+    def set_egress(self, name, origins, remove_headers=list()):
+        """ Updates the origins of an environments egress.
+
+        Parameters
+        ----------
+        name : str
+            The environment name
+        origins : dict
+            The egress hostname, or the origin settings with an address, for
+            each egress name. Origins that are left out are deleted.
+        remove_headers : list, optional
+            A list of headers to remove from incoming requests
+        """
+        return self.request(method='POST', path=f'/{name}/egress', payload={
+            "remove_request_headers": remove_headers,
+            "origins": dict(
+                (f"{egress_name}", egress if isinstance(egress, dict) else {"address": egress})
+                for egress_name, egress in origins.items()
+            ),
+        })
+
+
+class ProxyResource:
+    """The proxy endpoints of an application's environments.
+
+    Mixed into a client whose base path is an application's environment
+    collection, eg. ProxyClient on the controller and ModuleProxyClient in
+    modules.
+    """
+
+    def get(self, name, proxy='varnish'):
+        return self.request(f'/{name}/proxy/{proxy}/configuration')
+
+    def state(self, name, proxy='varnish', fresh=False):
+        """Get the state of an environment's proxy on each edge node.
+
+        Parameters
+        ----------
+        name : str
+            The environment name
+        proxy : str, optional
+            The proxy name
+        fresh : bool, optional
+            Bypass the response cache, pollers need the current state
+        """
+
+        return self.request(f'/{name}/proxy/{proxy}/state', fresh=fresh)
+
+    def ban(self, name, expression, wait=False, proxy='varnish'):
+        """Submit a ban expression to an environment's proxy.
+
+        Parameters
+        ----------
+        name : str
+            The environment name
+        expression : str
+            The ban expression, eg. req.url ~ /
+        wait : bool, optional
+            Have the API respond only once the ban has been applied
+        proxy : str, optional
+            The proxy name
+        """
+
+        async_ = 'false' if wait else 'true'
+        path = f'/{name}/proxy/{proxy}/state?banExpression={quote(expression, safe="")}&async={async_}'
+        return self.request(path=path, method='POST')
@@ -0,0 +1,261 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+DEFAULT_TTL = 60
+DEFAULT_MAX_ENTRIES = 512
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def _path_of(url):
+    return url.split('?', 1)[0].rstrip('/')
+
+
+def _affects(written, cached):
+    """Whether a write to one URL makes a cached URL stale.
+
+    Writes invalidate the resource itself, everything beneath it and every
+    listing above it, eg. a POST to /environment/Develop/domain/example.com
+    invalidates /environment/Develop and /environment.
+    """
+
+    written = _path_of(written)
+    cached = _path_of(cached)
+    return written == cached or written.startswith(cached + '/') or cached.startswith(written + '/')
+
+
+class MemoryBackend:
+    """A thread-safe in-process LRU store."""
+
+    # Whether calls block on I/O, async clients run those in a worker thread.
+    blocking = False
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, url, body, etag=None, last_modified=None):
+        with self._lock:
+            self._entries[key] = (url, time.time(), body, etag, last_modified)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate(self, url):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if _affects(url, entry[0])]:
+                del self._entries[key]
+
+
+class SqliteBackend:
+    """An LRU store in a sqlite file that separate processes can share."""
+
+    blocking = True
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, mode=0o700)
+
+        with self._connect() as db:
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS responses '
+                '(key TEXT PRIMARY KEY, url TEXT, stored_at REAL, accessed_at REAL, body BLOB, etag TEXT, last_modified TEXT)'
+            )
+
+            # Caches created before validators were stored lack their columns.
+            columns = [row[1] for row in db.execute('PRAGMA table_info(responses)')]
+            for column in ('etag', 'last_modified'):
+                if column not in columns:
+                    db.execute(f'ALTER TABLE responses ADD COLUMN {column} TEXT')
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def get(self, key):
+        with self._lock, self._connect() as db:
+            row = db.execute(
+                'SELECT url, stored_at, body, etag, last_modified FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None:
+                db.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (time.time(), key))
+                return row[0], row[1], bytes(row[2]), row[3], row[4]
+        return None
+
+    def set(self, key, url, body, etag=None, last_modified=None):
+        now = time.time()
+        with self._lock, self._connect() as db:
+            db.execute(
+                'REPLACE INTO responses (key, url, stored_at, accessed_at, body, etag, last_modified) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, url, now, now, sqlite3.Binary(body), etag, last_modified)
+            )
+            db.execute(
+                'DELETE FROM responses WHERE key IN '
+                '(SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+
+    def delete(self, key):
+        with self._lock, self._connect() as db:
+            db.execute('DELETE FROM responses WHERE key = ?', (key,))
+
+    def invalidate(self, url):
+        with self._lock, self._connect() as db:
+            stale = [(key,) for key, cached in db.execute('SELECT key, url FROM responses') if _affects(url, cached)]
+            db.executemany('DELETE FROM responses WHERE key = ?', stale)
+
+
+class ResponseCache:
+    """A read-through cache of GET response bodies.
+
+    Entries are keyed by URL and credentials so different users never see
+    each other's responses, and are served for ttl seconds after they were
+    stored. Expired entries with an ETag or Last-Modified validator are kept
+    so the client can revalidate them with a conditional request.
+
+    Parameters
+    ----------
+    backend : MemoryBackend|SqliteBackend
+        The store to keep responses in
+    ttl : int, optional
+        The number of seconds a response is served from the cache, with 0
+        responses are only ever served after revalidation
+    """
+
+    def __init__(self, backend, ttl=DEFAULT_TTL):
+        self.backend = backend
+        self.ttl = ttl
+
+    @property
+    def blocking(self):
+        return self.backend.blocking
+
+    def key(self, url, credentials):
+        return hashlib.sha256(f'{credentials}\n{url}'.encode('utf-8')).hexdigest()
+
+    def get(self, url, credentials):
+        """Return the cached body for a URL or None when it is missing or expired."""
+
+        key = self.key(url, credentials)
+        entry = self.backend.get(key)
+
+        if entry is None:
+            return None
+
+        if time.time() - entry[1] > self.ttl:
+            if not (entry[3] or entry[4]):
+                self.backend.delete(key)
+            return None
+
+        return entry[2]
+
+    def validators(self, url, credentials):
+        """Return the validators stored for a URL.
+
+        Returns
+        ----------
+        tuple|None
+            The ETag, Last-Modified and body of the stored response, None
+            when there is no response with a validator
+        """
+
+        entry = self.backend.get(self.key(url, credentials))
+
+        if entry is None or not (entry[3] or entry[4]):
+            return None
+
+        return entry[3], entry[4], entry[2]
+
+    def set(self, url, credentials, body, etag=None, last_modified=None):
+        # Without a ttl a response is only useful if it can be revalidated.
+        if self.ttl <= 0 and not (etag or last_modified):
+            return
+
+        self.backend.set(self.key(url, credentials), url, body, etag, last_modified)
+
+    def invalidate(self, url):
+        """Drop every cached response a write to url may have changed."""
+
+        self.backend.invalidate(url)
+
+
+def default_cache_path():
+    """Return the sqlite cache file under the Ansible local tmp dir."""
+
+    tmp = os.environ.get('ANSIBLE_LOCAL_TEMP', '~/.ansible/tmp')
+    return os.path.join(os.path.expanduser(tmp), 'section_api_cache.sqlite')
+
+
+def get_response_cache(settings=None):
+    """Return the process-wide response cache for a set of cache settings.
+
+    Caching is opt-in. Settings are read from the client's cache option,
+    either True or a dict with backend (memory or sqlite), ttl, max_entries
+    and path keys, falling back to the SECTION_API_CACHE (backend) and
+    SECTION_API_CACHE_TTL environment variables.
+
+    Returns
+    ----------
+    ResponseCache|None
+        The cache to use, None when caching is disabled
+    """
+
+    if not settings:
+        if not os.environ.get('SECTION_API_CACHE'):
+            return None
+        settings = {}
+
+    if not isinstance(settings, dict):
+        settings = {}
+
+    backend = settings.get('backend') or os.environ.get('SECTION_API_CACHE') or 'memory'
+    ttl = settings.get('ttl')
+    if ttl is None:
+        ttl = os.environ.get('SECTION_API_CACHE_TTL') or DEFAULT_TTL
+    ttl = int(ttl)
+    max_entries = int(settings.get('max_entries') or DEFAULT_MAX_ENTRIES)
+    path = settings.get('path') or default_cache_path()
+
+    key = (backend, path if backend == 'sqlite' else None, ttl, max_entries)
+
+    with _caches_lock:
+        if key not in _caches:
+            if backend == 'sqlite':
+                store = SqliteBackend(path, max_entries)
+            else:
+                store = MemoryBackend(max_entries)
+            _caches[key] = ResponseCache(store, ttl)
+
+        return _caches[key]
@@ -0,0 +1,283 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_tz, mktime_tz
+
+from ansible.module_utils.six.moves.urllib.error import HTTPError
+from ansible.module_utils.urls import ConnectionError, SSLValidationError
+
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 30
+MAX_RETRY_AFTER = 300
+
+# Requests per second and burst size for each endpoint class, 0 disables the
+# limit. Requests are not throttled unless a plugin's rate_limits asks for it,
+# 429 and 503 responses are still retried after Retry-After.
+DEFAULT_RATE_LIMITS = {
+    'read': {'rate': 0, 'burst': 1},
+    'write': {'rate': 0, 'burst': 1},
+    'ban': {'rate': 0, 'burst': 1},
+}
+
+# Methods that are safe to send again after a failure, for retries and for
+# resending on a dropped keep-alive connection in the transports.
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'DELETE')
+
+# Connection errors that repeating the request will not fix.
+NOT_TRANSIENT = (SSLValidationError,)
+
+# Statuses that are retried for every method, the server did not act on them.
+RETRY_ALWAYS = (429, 503)
+# Statuses that are only retried when repeating the request is safe.
+RETRY_IDEMPOTENT = (500, 502, 504)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+class TokenBucket:
+    """A thread-safe token bucket.
+
+    Parameters
+    ----------
+    rate : float
+        The number of tokens added per second, 0 for no limit
+    burst : int
+        The maximum number of tokens the bucket holds
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = max(float(burst), 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token if one is available.
+
+        Returns
+        ----------
+        float
+            0 when a token was taken, otherwise the seconds until one is available
+        """
+
+        if self.rate <= 0:
+            return 0
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """Take a token, sleeping until one is available."""
+
+        while True:
+            wait = self.reserve()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Take a token, yielding to the event loop until one is available."""
+
+        while True:
+            wait = self.reserve()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+def endpoint_class(method, url):
+    """Classify a request for rate limiting as read, write or ban."""
+
+    path = url.split('?', 1)[0]
+
+    if '/proxy/' in path and path.endswith('/state') and method != 'GET':
+        return 'ban'
+
+    return 'read' if method in ('GET', 'HEAD') else 'write'
+
+
+def retry_after(error):
+    """Return the delay in seconds requested by a Retry-After header, if any."""
+
+    value = error.headers.get('Retry-After') if error.headers is not None else None
+
+    if not value:
+        return None
+
+    try:
+        delay = float(value)
+    except ValueError:
+        parsed = parsedate_tz(value)
+        if parsed is None:
+            return None
+        delay = mktime_tz(parsed) - time.time()
+
+    return min(max(delay, 0.0), MAX_RETRY_AFTER)
+
+
+class RequestScheduler:
+    """Rate limit and retry API requests.
+
+    Every request first takes a token from the bucket of its endpoint class.
+    Requests failing with 429 or 503, or with another 5xx or a connection
+    error when the method is idempotent, are retried with exponential
+    backoff and full jitter, or after the delay given by Retry-After.
+
+    Parameters
+    ----------
+    retries : int, optional
+        The number of times to retry a request
+    backoff : float, optional
+        The base delay in seconds, doubled for each attempt
+    max_backoff : float, optional
+        The longest delay between attempts when there is no Retry-After
+    rate_limits : dict, optional
+        rate and burst per endpoint class, merged over DEFAULT_RATE_LIMITS
+    """
+
+    def __init__(self, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, max_backoff=DEFAULT_MAX_BACKOFF, rate_limits=None):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.buckets = {}
+        self.limits = {}
+        self._lock = threading.Lock()
+        self.configure(rate_limits)
+
+    def configure(self, rate_limits=None):
+        """Replace the token buckets of endpoint classes whose limits changed."""
+
+        limits = dict(DEFAULT_RATE_LIMITS) if not self.limits else {}
+        limits.update(rate_limits or {})
+
+        with self._lock:
+            for name, limit in limits.items():
+                if self.limits.get(name) != limit:
+                    self.limits[name] = limit
+                    self.buckets[name] = TokenBucket(limit.get('rate', 0), limit.get('burst', 1))
+
+    def bucket(self, name):
+        with self._lock:
+            if name not in self.buckets:
+                self.buckets[name] = TokenBucket(0, 1)
+            return self.buckets[name]
+
+    def delay(self, attempt):
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+    def retryable(self, method, error):
+        if isinstance(error, NOT_TRANSIENT):
+            return False
+        if isinstance(error, HTTPError):
+            return error.code in RETRY_ALWAYS or (error.code in RETRY_IDEMPOTENT and method in IDEMPOTENT_METHODS)
+        return method in IDEMPOTENT_METHODS
+
+    def call(self, method, url, send, on_retry=None, retries=None):
+        """Send a request through the rate limiter, retrying transient failures.
+
+        Parameters
+        ----------
+        method : str
+            The HTTP method, used to decide whether a retry is safe
+        url : str
+            The request URL, used to pick the endpoint class
+        send : callable
+            Sends the request and returns the response
+        on_retry : callable, optional
+            Called with the attempt number, the error and the delay before each retry
+        retries : int, optional
+            Override the scheduler's number of retries for this request
+
+        Returns
+        ----------
+        The return value of send
+        """
+
+        bucket = self.bucket(endpoint_class(method, url))
+        retries = self.retries if retries is None else retries
+        attempt = 0
+
+        while True:
+            bucket.acquire()
+
+            try:
+                return send()
+            except (HTTPError, ConnectionError) as e:
+                if attempt >= retries or not self.retryable(method, e):
+                    raise
+
+                delay = retry_after(e) if isinstance(e, HTTPError) else None
+                if delay is None:
+                    delay = self.delay(attempt)
+
+                attempt += 1
+
+                if on_retry is not None:
+                    on_retry(attempt, e, delay)
+
+                time.sleep(delay)
+
+    async def call_async(self, method, url, send, on_retry=None, retries=None):
+        """Await a request through the rate limiter, retrying transient failures.
+
+        Takes the same parameters as call, with send returning an awaitable.
+        """
+
+        bucket = self.bucket(endpoint_class(method, url))
+        retries = self.retries if retries is None else retries
+        attempt = 0
+
+        while True:
+            await bucket.acquire_async()
+
+            try:
+                return await send()
+            except (HTTPError, ConnectionError) as e:
+                if attempt >= retries or not self.retryable(method, e):
+                    raise
+
+                delay = retry_after(e) if isinstance(e, HTTPError) else None
+                if delay is None:
+                    delay = self.delay(attempt)
+
+                attempt += 1
+
+                if on_retry is not None:
+                    on_retry(attempt, e, delay)
+
+                await asyncio.sleep(delay)
+
+
+def get_scheduler(rate_limits=None):
+    """Return the request scheduler shared by every client in this process.
+
+    Parameters
+    ----------
+    rate_limits : dict, optional
+        rate and burst per endpoint class to apply to the shared scheduler
+    """
+
+    global _scheduler
+
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler(rate_limits=rate_limits)
+        elif rate_limits:
+            _scheduler.configure(rate_limits)
+
+        return _scheduler
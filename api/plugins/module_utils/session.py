@@ -0,0 +1,119 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import base64
+import hashlib
+import threading
+
+from ansible_collections.section.api.plugins.module_utils.async_transport import DEFAULT_LIMIT, AsyncConnectionPool, get_loop
+from ansible_collections.section.api.plugins.module_utils.transport import DEFAULT_POOL_SIZE, ConnectionPool
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class Session:
+    """The connections and authentication of one set of API credentials.
+
+    Clients created with the same credentials and endpoint share a session,
+    so they reuse its warm keep-alive connections, and async clients its
+    connections on the shared event loop. Sessions for different
+    credentials never share connections or headers.
+
+    Parameters
+    ----------
+    username : str
+        The account name to authenticate with the API
+    password : str
+        The password (or token) to authenticate with the API
+    endpoint : str
+        The API endpoint the session connects to
+    pool_size : int, optional
+        The number of idle connections to keep alive per host
+    """
+
+    def __init__(self, username, password, endpoint, pool_size=DEFAULT_POOL_SIZE):
+        self.username = username
+        self.endpoint = endpoint
+
+        credentials = f'{username}:{password}'.encode('utf-8')
+        self.auth_header = 'Basic %s' % base64.b64encode(credentials).decode('ascii')
+
+        self.headers = {
+            'Content-Type': 'application/json',
+            'Authorization': self.auth_header,
+        }
+
+        self.pool = ConnectionPool(pool_size or DEFAULT_POOL_SIZE)
+
+        self._async_pool = None
+        self._async_loop = None
+        self._lock = threading.Lock()
+
+    def request_headers(self, headers=None):
+        """Return a request's headers, the session's own headers take precedence."""
+
+        merged = dict(headers or {})
+        merged.update(self.headers)
+        return merged
+
+    def async_pool(self, limit=None):
+        """Return the session's connection pool on the shared event loop.
+
+        A forked process runs a loop of its own and gets a new pool.
+
+        Parameters
+        ----------
+        limit : int, optional
+            Grow the number of connections open per host to at least this
+        """
+
+        loop = get_loop()
+
+        with self._lock:
+            if self._async_pool is None or self._async_loop is not loop:
+                self._async_pool = AsyncConnectionPool(max(limit or 0, DEFAULT_LIMIT), fallback=self.pool)
+                self._async_loop = loop
+            elif limit and limit > self._async_pool.limit:
+                self._async_pool.limit = limit
+
+            return self._async_pool
+
+    def stats(self):
+        """Return the latency counters of the session's connection pool."""
+
+        return self.pool.stats.summary()
+
+
+def session_key(username, password, endpoint):
+    digest = hashlib.sha256(f'{username}:{password}'.encode('utf-8')).hexdigest()
+    return (endpoint, username, digest)
+
+
+def get_session(username, password, endpoint, pool_size=None):
+    """Return the process-wide session for a set of credentials and an endpoint.
+
+    Parameters
+    ----------
+    pool_size : int, optional
+        Grow the session's number of idle connections per host to at least this
+    """
+
+    key = session_key(username, password, endpoint)
+
+    with _sessions_lock:
+        session = _sessions.get(key)
+
+        if session is None:
+            session = _sessions[key] = Session(username, password, endpoint, pool_size)
+        elif pool_size and pool_size > session.pool.size:
+            session.pool.size = pool_size
+
+        return session
+
+
+def sessions():
+    """Return every session created in this process."""
+
+    with _sessions_lock:
+        return list(_sessions.values())
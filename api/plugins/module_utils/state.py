@@ -0,0 +1,305 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import time
+
+from ansible.errors import AnsibleError
+from ansible_collections.section.api.plugins.module_utils.concurrency import run_concurrently, run_graph
+from ansible_collections.section.api.plugins.module_utils.domains import domain_names, plan_domains
+from ansible_collections.section.api.plugins.module_utils.egress import egress_diff, merge_origins, normalise_spec
+from ansible_collections.section.api.plugins.module_utils.provision import DEFAULT_TIMEOUT, wait_until_usable
+
+
+def normalise_state(environments, remove_headers=None):
+    """Normalise a desired-state document.
+
+    Parameters
+    ----------
+    environments : dict
+        The desired state of each environment, keyed by name. Each is a dict
+        with optional domains (a list of hostnames), egress (an egress spec,
+        see normalise_spec), and source and domain, the environment to copy
+        and the first hostname, used when the environment does not exist yet
+    remove_headers : list, optional
+        The headers to remove for egress specs that do not list their own
+
+    Returns
+    ----------
+    dict
+        The normalised state of each environment, keyed by name
+
+    Raises
+    ----------
+    AnsibleError
+        Raised when the document is malformed
+    """
+
+    if not isinstance(environments, dict):
+        raise AnsibleError("Parameter 'environments' must map environment names to their desired state")
+
+    desired = {}
+
+    for name, spec in environments.items():
+        spec = spec or {}
+        if not isinstance(spec, dict):
+            raise AnsibleError(f"The desired state of environment '{name}' must be a dict")
+
+        domains = spec.get('domains')
+        if domains is not None and not isinstance(domains, list):
+            domains = [domains]
+
+        desired[name] = {
+            'source': spec.get('source'),
+            'domain': spec.get('domain'),
+            'domains': domains,
+            'egress': normalise_spec(spec['egress'], remove_headers) if spec.get('egress') is not None else None,
+        }
+
+    return desired
+
+
+def snapshot_state(client, desired, max_concurrency=4):
+    """Fetch the current state of an application's environments.
+
+    One listing call returns every environment with its domains, then the
+    egress of each existing environment with a desired egress is fetched
+    concurrently.
+
+    Returns
+    ----------
+    dict
+        domains, a set of domain names, and egress, the configuration or
+        None when it was not fetched, for each existing environment keyed by name
+    """
+
+    current = dict(
+        (environment['environment_name'], {'domains': domain_names(environment), 'egress': None})
+        for environment in client.all()
+    )
+
+    names = [name for name in desired if name in current and desired[name]['egress'] is not None]
+
+    for name, egress in zip(names, run_concurrently(client.list_egress, names, max_concurrency)):
+        current[name]['egress'] = egress
+
+    return current
+
+
+def plan_state(current, desired, exclusive=False):
+    """Work out the operations that converge the current state to the desired state.
+
+    Environments are created before anything else is done to them, and
+    after the environment they are copied from has converged, so they copy
+    its desired egress rather than the one it is about to lose. A hostname
+    removed from one environment is removed before it is added to another,
+    or before an environment is created with it.
+
+    Parameters
+    ----------
+    current : dict
+        The state returned by snapshot_state
+    desired : dict
+        The state returned by normalise_state
+    exclusive : bool, optional
+        Remove existing domains that are not listed in an environment's domains
+
+    Returns
+    ----------
+    dict
+        The plan, with create, domains and egress changes for reporting, and
+        operations, the (id, operation, requires) tuples to apply
+
+    Raises
+    ----------
+    AnsibleError
+        Raised when an environment must be created without a source or domain
+    """
+
+    create = plan_creates(current, desired)
+    created = set(environment['name'] for environment in create)
+
+    domains = plan_domain_changes(current, desired, created, exclusive)
+    egress, egress_operations = plan_egress(current, desired, created)
+    domain_operations = plan_domain_operations(domains, created)
+
+    operations = create_operations(create, created, domain_operations + egress_operations)
+
+    return {
+        'create': create,
+        'domains': domains,
+        'egress': egress,
+        'operations': operations + domain_operations + egress_operations,
+    }
+
+
+def plan_creates(current, desired):
+    """Return the environments to create, with their source and first domain.
+
+    Raises
+    ----------
+    AnsibleError
+        Raised when an environment can not be created, or environments are
+        copied from each other
+    """
+
+    create = []
+
+    for name, spec in desired.items():
+        if name in current:
+            continue
+
+        if not spec['source'] or not spec['domain']:
+            raise AnsibleError(f"Environment '{name}' does not exist, 'source' and 'domain' are required to create it")
+
+        if spec['source'] not in current and spec['source'] not in desired:
+            raise AnsibleError(f"Environment '{name}' is copied from '{spec['source']}', which does not exist")
+
+        create.append({'name': name, 'source': spec['source'], 'domain': spec['domain']})
+
+    sources = dict((environment['name'], environment['source']) for environment in create)
+
+    for name in sources:
+        chain = [name]
+        while sources.get(chain[-1]) in sources:
+            chain.append(sources[chain[-1]])
+            if chain[-1] in chain[:-1]:
+                raise AnsibleError('Environments can not be copied from each other: %s' % ' -> '.join(chain))
+
+    return create
+
+
+def create_operations(create, created, operations):
+    """Return the create operations.
+
+    Each create requires its source's create, and its source's
+    remove_domain and set_egress operations. It also requires the removal
+    of its first domain from an existing environment.
+    """
+
+    creates = []
+
+    for environment in create:
+        requires = [('create', environment['source'])] if environment['source'] in created else []
+
+        for key, operation, _ in operations:
+            if key[0] in ('remove_domain', 'set_egress') and key[1] == environment['source']:
+                requires.append(key)
+            elif key[0] == 'remove_domain' and key[1] not in created and key[2] == environment['domain']:
+                requires.append(key)
+
+        creates.append((('create', environment['name']), ('create', environment), requires))
+
+    return creates
+
+
+def plan_domain_changes(current, desired, created, exclusive=False):
+    """Return the domain plan of each environment with domains to add or remove."""
+
+    domains = {}
+
+    for name, spec in desired.items():
+        if spec['domains'] is None:
+            continue
+
+        existing = set([spec['domain']]) if name in created else current[name]['domains']
+        plan = plan_domains(existing, spec['domains'], 'present', exclusive)
+
+        if plan['add'] or plan['remove']:
+            domains[name] = plan
+
+    return domains
+
+
+def plan_domain_operations(domains, created):
+    """Return the add_domain and remove_domain operations of the domain plans."""
+
+    operations = []
+    removals = set((hostname, name) for name, plan in domains.items() for hostname in plan['remove'])
+
+    for name, plan in domains.items():
+        requires = [('create', name)] if name in created else []
+
+        for hostname in plan['remove']:
+            operations.append((('remove_domain', name, hostname), ('remove_domain', name, hostname), requires))
+
+        for hostname in plan['add']:
+            moved = [('remove_domain', other, hostname) for removed, other in sorted(removals) if removed == hostname]
+            operations.append((('add_domain', name, hostname), ('add_domain', name, hostname), requires + moved))
+
+    return operations
+
+
+def plan_egress(current, desired, created):
+    """Return the egress changes of each environment and their set_egress operations."""
+
+    egress = {}
+    operations = []
+
+    for name, spec in desired.items():
+        if spec['egress'] is None:
+            continue
+
+        # Created environments start with a copy of their source's egress,
+        # it is fetched when they are applied.
+        before = None if name in created else current[name]['egress'] or {}
+        diff = egress_diff(before or {}, spec['egress'])
+
+        if diff:
+            egress[name] = diff
+            requires = [('create', name)] if name in created else []
+            operations.append((('set_egress', name), ('set_egress', name, spec['egress'], before), requires))
+
+    return egress, operations
+
+
+def apply_plan(client, plan, max_concurrency=4, timeout=DEFAULT_TIMEOUT):
+    """Apply a plan's operations, in parallel where their requirements allow.
+
+    A created environment that other operations require is polled with
+    wait_until_usable before they start.
+
+    Returns
+    ----------
+    int
+        The number of operations applied
+
+    Raises
+    ----------
+    AnsibleError
+        Raised when an API request fails or a created environment is not
+        usable within timeout, operations already in flight finish but no
+        further ones are started
+    """
+
+    required = set(key for _, _, requires in plan['operations'] for key in requires)
+
+    def create(environment):
+        name = environment['name']
+        started = time.time()
+        response = client.create(name, environment['source'], environment['domain'])
+
+        if ('create', name) in required:
+            waited = wait_until_usable(client, {name: environment['domain']}, {name: started}, timeout)
+            if not waited[name]['ready']:
+                raise AnsibleError(f"Timed out waiting for environment '{name}' to become usable")
+
+        return response
+
+    def apply(operation):
+        action = operation[0]
+
+        if action == 'create':
+            return create(operation[1])
+        if action == 'add_domain':
+            return client.add_domain(operation[1], operation[2])
+        if action == 'remove_domain':
+            return client.delete_domain(operation[1], operation[2])
+
+        name, spec, before = operation[1:]
+        if before is None:
+            before = client.list_egress(name)
+        return client.set_egress(name, merge_origins(before, spec), spec['remove_headers'])
+
+    tasks = dict((key, (operation, requires)) for key, operation, requires in plan['operations'])
+
+    return len(run_graph(apply, tasks, max_concurrency))
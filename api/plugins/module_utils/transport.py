@@ -0,0 +1,417 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import base64
+import io
+import os
+import select
+import socket
+import ssl
+import threading
+import time
+
+from ansible.module_utils.six.moves import http_client
+from ansible.module_utils.six.moves.urllib.error import HTTPError
+from ansible.module_utils.six.moves.urllib.parse import unquote, urlparse
+from ansible.module_utils.six.moves.urllib.request import getproxies, proxy_bypass
+from ansible.module_utils.urls import ConnectionError, SSLValidationError
+from ansible_collections.section.api.plugins.module_utils.scheduler import IDEMPOTENT_METHODS
+
+DEFAULT_POOL_SIZE = 10
+CHUNK_SIZE = 65536
+
+
+class TimedHTTPConnection(http_client.HTTPConnection):
+    """An HTTP connection that records how long it took to connect."""
+
+    connect_time = 0.0
+    tls_time = 0.0
+
+    def connect(self):
+        start = time.perf_counter()
+        http_client.HTTPConnection.connect(self)
+        self.connect_time = time.perf_counter() - start
+
+
+class TimedHTTPSConnection(http_client.HTTPSConnection):
+    """An HTTPS connection that records its TCP connect and TLS handshake times."""
+
+    connect_time = 0.0
+    tls_time = 0.0
+
+    def connect(self):
+        start = time.perf_counter()
+        http_client.HTTPConnection.connect(self)
+        connected = time.perf_counter()
+        self.connect_time = connected - start
+
+        server_hostname = self._tunnel_host or self.host
+        self.sock = self._context.wrap_socket(self.sock, server_hostname=server_hostname)
+        self.tls_time = time.perf_counter() - connected
+
+
+def proxy_for(scheme, host):
+    """Return the proxy to send requests for a host through, if any.
+
+    The proxy comes from the https_proxy and http_proxy environment
+    variables, hosts matched by no_proxy are requested directly.
+
+    Returns
+    ----------
+    ParseResult|None
+        The parsed proxy URL, None to connect to the host directly
+    """
+
+    proxy = getproxies().get(scheme)
+
+    if not proxy or proxy_bypass(host):
+        return None
+
+    if '://' not in proxy:
+        proxy = f'http://{proxy}'
+
+    return urlparse(proxy)
+
+
+def proxy_headers(proxy):
+    """Return the Proxy-Authorization header for a proxy URL with credentials."""
+
+    if proxy is None or proxy.username is None:
+        return {}
+
+    credentials = f'{unquote(proxy.username)}:{unquote(proxy.password or "")}'.encode('utf-8')
+
+    return {'Proxy-Authorization': 'Basic %s' % base64.b64encode(credentials).decode('ascii')}
+
+
+def dropped(connection):
+    """Whether the server closed an idle connection, its socket is readable then."""
+
+    if connection.sock is None:
+        return True
+
+    try:
+        return bool(select.select([connection.sock], [], [], 0)[0])
+    except (ValueError, socket.error):
+        return True
+
+
+class Response:
+    """A fully read HTTP response."""
+
+    trace = None
+
+    def __init__(self, url, status, reason, headers, body):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+
+    def read(self):
+        return self.body
+
+
+class StreamedResponse(Response):
+    """A response whose body is read from its connection on demand.
+
+    The connection goes back to the pool once the body has been read to
+    the end, or is closed when the body is abandoned part way through.
+    """
+
+    def __init__(self, pool, key, connection, reused, response, url, start, trace=None):
+        Response.__init__(self, url, response.status, response.reason, response.headers, None)
+        self._pool = pool
+        self._key = key
+        self._connection = connection
+        self._reused = reused
+        self._response = response
+        self._start = start
+        self._headers_received = time.perf_counter()
+        self.trace = trace
+
+    def _finish(self, complete):
+        connection, self._connection = self._connection, None
+
+        if connection is None:
+            return
+
+        if complete and not self._response.will_close:
+            self._pool._release(self._key, connection)
+        else:
+            connection.close()
+
+        self._pool.stats.record(time.time() - self._start, self._reused)
+
+        if self.trace is not None:
+            self.trace.body = time.perf_counter() - self._headers_received
+
+    def iter_chunks(self, size=CHUNK_SIZE):
+        """Yield the body in chunks of at most size bytes as they arrive."""
+
+        complete = False
+        try:
+            while True:
+                chunk = self._response.read(size)
+                if not chunk:
+                    complete = True
+                    return
+                if self.trace is not None:
+                    self.trace.bytes_in += len(chunk)
+                yield chunk
+        except (http_client.HTTPException, socket.error) as e:
+            raise ConnectionError(f'{self.url}: {e}')
+        finally:
+            self._finish(complete)
+
+    def read(self):
+        if self.body is None:
+            self.body = b''.join(self.iter_chunks())
+        return self.body
+
+
+class RequestStats:
+    """Thread-safe latency counters for the requests sent through a pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.new_connections = 0
+        self.reused_connections = 0
+
+    def record(self, elapsed, reused):
+        with self._lock:
+            self.requests += 1
+            self.total_time += elapsed
+            self.max_time = max(self.max_time, elapsed)
+            if reused:
+                self.reused_connections += 1
+            else:
+                self.new_connections += 1
+
+    def summary(self):
+        """Return the counters as a dict."""
+
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'total_time': self.total_time,
+                'mean_time': self.total_time / self.requests if self.requests else 0.0,
+                'max_time': self.max_time,
+                'new_connections': self.new_connections,
+                'reused_connections': self.reused_connections,
+            }
+
+
+class ConnectionPool:
+    """A thread-safe pool of keep-alive HTTP(S) connections.
+
+    Connections are keyed by scheme, host, port, certificate validation and
+    proxy. Hosts are reached through the proxy set by the https_proxy or
+    http_proxy environment variables unless no_proxy matches them, HTTPS
+    requests tunnel through the proxy with CONNECT.
+    A connection is only ever used by one request at a time and is returned
+    to the pool once its response has been read. At most size idle
+    connections are kept per key, any extra are closed.
+
+    Parameters
+    ----------
+    size : int, optional
+        The number of idle connections to keep alive per host
+    """
+
+    def __init__(self, size=DEFAULT_POOL_SIZE):
+        self.size = size
+        self.stats = RequestStats()
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _connect(self, key, timeout):
+        scheme, host, port, validate_certs, proxy = key
+
+        if proxy is not None:
+            proxy = urlparse(proxy)
+            address = (proxy.hostname, proxy.port or (443 if proxy.scheme == 'https' else 80))
+        else:
+            address = (host, port)
+
+        if scheme != 'https':
+            return TimedHTTPConnection(*address, timeout=timeout)
+
+        context = ssl.create_default_context()
+        if not validate_certs:
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+
+        connection = TimedHTTPSConnection(*address, timeout=timeout, context=context)
+        if proxy is not None:
+            connection.set_tunnel(host, port, headers=proxy_headers(proxy))
+
+        return connection
+
+    def _acquire(self, key, timeout):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked workers must not share sockets with their parent,
+                # drop the inherited connections without closing them.
+                self._idle = {}
+                self._pid = os.getpid()
+
+            idle = self._idle.get(key) or []
+            while idle:
+                connection = idle.pop()
+                # Skip connections the server has closed while they were idle.
+                if dropped(connection):
+                    connection.close()
+                    continue
+                connection.sock.settimeout(timeout)
+                return connection, True
+
+        return self._connect(key, timeout), False
+
+    def _release(self, key, connection):
+        with self._lock:
+            if self._pid != os.getpid():
+                connection.close()
+                return
+
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.size:
+                idle.append(connection)
+                return
+
+        connection.close()
+
+    def close(self):
+        """Close every idle connection."""
+
+        with self._lock:
+            idle, self._idle = self._idle, {}
+
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+    def _target(self, url, headers, validate_certs):
+        """Return the pool key, request path and headers for a URL."""
+
+        parsed = urlparse(url)
+        proxy = proxy_for(parsed.scheme, parsed.hostname)
+        key = (parsed.scheme, parsed.hostname, parsed.port, bool(validate_certs), proxy.geturl() if proxy else None)
+
+        headers = dict(headers or {})
+
+        if proxy is not None and parsed.scheme != 'https':
+            # Plain HTTP goes to the proxy with the absolute URL as the path.
+            headers.update(proxy_headers(proxy))
+            return key, url, headers
+
+        path = parsed.path or '/'
+        if parsed.query:
+            path = f'{path}?{parsed.query}'
+
+        return key, path, headers
+
+    def open(self, url, method='GET', headers=None, data=None, timeout=30, validate_certs=True, trace=None):
+        """Send a request over a pooled connection without reading the body.
+
+        Parameters
+        ----------
+        url : str
+            The absolute URL to request
+        method : str, optional
+            The HTTP method
+        headers : dict, optional
+            The request headers
+        data : str|bytes, optional
+            The request body
+        timeout : float, optional
+            The socket timeout in seconds
+        validate_certs : bool, optional
+            Whether to validate the server certificate
+        trace : RequestTrace, optional
+            Record the phases, sizes and status of the request on this trace
+
+        Returns
+        ----------
+        StreamedResponse
+            The response, its body must be read or iterated to free the connection
+
+        Raises
+        ----------
+        HTTPError
+            Raised when the server responds with a 4xx or 5xx status
+        SSLValidationError
+            Raised when the TLS handshake fails
+        ConnectionError
+            Raised when the server can not be reached
+        """
+
+        key, path, headers = self._target(url, headers, validate_certs)
+
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+
+        start = time.time()
+
+        while True:
+            connection, reused = self._acquire(key, timeout)
+            written = False
+            try:
+                if connection.sock is None:
+                    connection.connect()
+                sent = time.perf_counter()
+                connection.request(method, path, body=data, headers=headers)
+                written = True
+                response = connection.getresponse()
+                break
+            except ssl.SSLError as e:
+                connection.close()
+                raise SSLValidationError(str(e))
+            except (http_client.HTTPException, socket.error) as e:
+                connection.close()
+                # The server may have dropped a keep-alive connection just as
+                # it was reused, send again on a fresh connection unless the
+                # request was written and repeating it is not safe.
+                if reused and (not written or method in IDEMPOTENT_METHODS):
+                    continue
+                raise ConnectionError(f'{url}: {e}')
+
+        if trace is not None:
+            self._trace(trace, connection, reused, response, time.perf_counter() - sent, data)
+
+        streamed = StreamedResponse(self, key, connection, reused, response, url, start, trace)
+
+        if response.status >= 400:
+            body = streamed.read()
+            raise HTTPError(url, response.status, response.reason, response.headers, io.BytesIO(body))
+
+        return streamed
+
+    def _trace(self, trace, connection, reused, response, ttfb, data):
+        trace.reused = reused
+        trace.connect = 0.0 if reused else connection.connect_time
+        trace.tls = 0.0 if reused else connection.tls_time
+        trace.ttfb = ttfb
+        trace.status = response.status
+        trace.bytes_out = len(data or b'')
+        trace.bytes_in = 0
+
+    def request(self, url, method='GET', headers=None, data=None, timeout=30, validate_certs=True, trace=None):
+        """Send a request over a pooled connection and read the whole body.
+
+        Takes the same parameters and raises the same errors as open.
+
+        Returns
+        ----------
+        Response
+            The response with its body read
+        """
+
+        response = self.open(url, method=method, headers=headers, data=data, timeout=timeout,
+                             validate_certs=validate_certs, trace=trace)
+        response.read()
+        return response
@@ -1,17 +1,19 @@
 #!/usr/bin/python
 
 from __future__ import (absolute_import, division, print_function)
-from ansible_collections.section.api.plugins.module_utils.proxy_client import ProxyClient as ApiClient
+from ansible_collections.section.api.plugins.module_utils.module_client import ApiError, ModuleProxyClient as ApiClient
+from ansible_collections.section.api.plugins.module_utils.bans import ban_environments
 from ansible.module_utils.basic import AnsibleModule
 __metaclass__ = type
 
 DOCUMENTATION = r'''
 ---
-module: domain
-short_description: Manage application>environment domains.
+module: ban
+short_description: Ban objects from environment proxy caches.
 version_added: "1.0.0"
 description:
-    - Allows creating, updating, replacing and deleting domains for an environment.
+    - Submits ban expressions to the proxy of one or more environments, eg. to purge Varnish after a deploy.
+    - Environments are banned in parallel.
 options:
     account:
         description: The account id.
@@ -22,19 +24,43 @@ options:
         required: true
         type: int
     environment:
-        description: The environment name.
+        description:
+        - The environment name, or a list of environment names.
         required: true
-        type: str
+        type: list
+        elements: str
+        aliases: [ environments ]
+    expression:
+        description:
+        - The ban expression, or a list of ban expressions, to submit to every environment.
+        required: true
+        type: list
+        elements: str
+        aliases: [ expressions ]
     proxy:
         description: The proxy to send the ban to.
-        required: true
+        required: false
         type: str
         default: varnish
     wait:
-        description: Wait for edge nodes to be cleared.
+        description:
+        - Wait for edge nodes to be cleared.
+        - The proxy state is polled with backoff until no edge node lists the expressions.
         required: false
         type: bool
         default: false
+    timeout:
+        description: How many seconds to wait for edge nodes to be cleared when I(wait=true).
+        required: false
+        type: int
+        default: 300
+    max_concurrency:
+        description: Maximum number of environments to ban in parallel.
+        required: false
+        type: int
+        default: 4
+extends_documentation_fragment:
+  - section.api.auth_options
 author:
     - Steve Worley (@steveworley)
 '''
@@ -45,10 +71,28 @@ EXAMPLES = r'''
     account: 1
     application: 1
     environment: 'Production'
-    expression: req.url~/
+    expression: req.url ~ /
+    wait: true
+
+- name: Purge every branch environment after a deploy
+  section.api.ban:
+    account: 1
+    application: 1
+    environments: "{{ branch_environments }}"
+    expressions:
+      - req.url ~ ^/assets
+      - req.http.host == www.example.com
     wait: true
 '''
 
+RETURN = r'''
+result:
+    description: The ban results for each environment, including timings in seconds.
+    returned: always
+    type: list
+    elements: dict
+'''
+
 
 def main():
     module_args = dict(
@@ -57,12 +101,15 @@ def main():
         headers=dict(type='dict', required=False, default={}),
         section_account=dict(type='int', required=True),
         section_application=dict(type='int', required=True),
-        environment=dict(type='str', required=True),
-        hostname=dict(type='str', required=True),
-        state=dict(type='str', required=False, default='present'),
+        environment=dict(type='list', elements='str', required=True, aliases=['environments']),
+        expression=dict(type='list', elements='str', required=True, aliases=['expressions']),
+        proxy=dict(type='str', required=False, default='varnish'),
+        wait=dict(type='bool', required=False, default=False),
+        timeout=dict(type='int', required=False, default=300),
+        max_concurrency=dict(type='int', required=False, default=4),
     )
 
-    result = dict(changed=False, result={})
+    result = dict(changed=False, result=[])
 
     module = AnsibleModule(
         argument_spec=module_args,
@@ -77,7 +124,26 @@ def main():
         {'headers': module.params['headers']}
     )
 
-    client.ban('varnish', module.params['expression'])
+    try:
+        result['result'] = ban_environments(
+            client,
+            module.params['environment'],
+            module.params['expression'],
+            proxy=module.params['proxy'],
+            wait=module.params['wait'],
+            timeout=module.params['timeout'],
+            max_concurrency=module.params['max_concurrency'],
+        )
+    except ApiError as e:
+        module.fail_json(msg=str(e), **result)
+    result['changed'] = True
+
+    pending = [ban['environment'] for ban in result['result'] if ban.get('pending')]
+    if pending:
+        module.fail_json(msg='Timed out waiting for edge nodes to clear the ban on: %s' % ', '.join(pending), **result)
+
+    module.exit_json(**result)
+
 
 if __name__ == '__main__':
     main()
@@ -1,7 +1,8 @@
 #!/usr/bin/python
 
 from __future__ import (absolute_import, division, print_function)
-from ansible_collections.section.api.plugins.module_utils.env_client import EnvClient as ApiClient
+from ansible_collections.section.api.plugins.module_utils.module_client import ApiError, ModuleEnvClient as ApiClient
+from ansible_collections.section.api.plugins.module_utils.domains import apply_domains, domain_diff, domain_names, domain_result, plan_domains
 from ansible.module_utils.basic import AnsibleModule
 __metaclass__ = type
 
@@ -26,9 +27,27 @@ options:
         required: true
         type: str
     hostname:
-        description: The hostname to add.
-        required: true
+        description:
+        - The hostname to add.
+        - Mutually exclusive with I(hostnames).
+        required: false
         type: str
+    hostnames:
+        description:
+        - A list of hostnames to add or remove with a single environment lookup.
+        - Mutually exclusive with I(hostname).
+        required: false
+        type: list
+        elements: str
+    exclusive:
+        description:
+        - When I(state=present), also remove every existing domain that is not listed in I(hostnames).
+        type: bool
+        default: false
+    max_concurrency:
+        description: Maximum number of domains to add or remove in parallel.
+        type: int
+        default: 4
     public_key:
         description: Optional public key for SSL.
         required: false
@@ -58,6 +77,16 @@ EXAMPLES = r'''
     environment: 'Production'
     hostname: www.test.com
     state: absent
+
+- name: Make these the only domains of the Production environment.
+  section.api.domain:
+    account: 1
+    application: 1
+    environment: 'Production'
+    hostnames:
+      - www.test.com
+      - test.com
+    exclusive: true
 '''
 
 
@@ -69,14 +98,19 @@ def main():
         section_account=dict(type='int', required=True),
         section_application=dict(type='int', required=True),
         environment=dict(type='str', required=True),
-        hostname=dict(type='str', required=True),
-        state=dict(type='str', required=False, default='present'),
+        hostname=dict(type='str', required=False),
+        hostnames=dict(type='list', elements='str', required=False),
+        exclusive=dict(type='bool', required=False, default=False),
+        max_concurrency=dict(type='int', required=False, default=4),
+        state=dict(type='str', required=False, default='present', choices=['absent', 'present']),
     )
 
     result = dict(changed=False, result={})
 
     module = AnsibleModule(
         argument_spec=module_args,
+        mutually_exclusive=[('hostname', 'hostnames')],
+        required_one_of=[('hostname', 'hostnames')],
         supports_check_mode=True
     )
 
@@ -88,37 +122,33 @@ def main():
         options={'headers': module.params['headers']}
     )
 
-    environment = client.get(module.params['environment'])
+    hostname = module.params['hostname']
+    state = module.params['state']
 
-    if module.check_mode:
-        found = False
-        for domain in environment['domains']:
-            if domain['name'] == module.params['hostname']:
-                found = True
+    try:
+        environment = client.get(module.params['environment'])
+    except ApiError as e:
+        module.fail_json(msg=str(e), **result)
+
+    existing = domain_names(environment)
 
-        if module.params['state'] == 'present':
-            result['result'] = "Create" if not found else "No change"
+    plan = plan_domains(existing, [hostname] if hostname else module.params['hostnames'], state, module.params['exclusive'])
 
-        if module.params['state'] == 'absent':
-            result['result'] = "Remove" if found else "No change"
+    result['changed'] = bool(plan['add'] or plan['remove'])
+    result['plan'] = plan
+    result['diff'] = domain_diff(existing, plan)
 
+    if module.check_mode:
+        result['result'] = domain_result(plan, hostname, state)
         module.log('Check result for section.api.domain: %s' % result['result'])
         module.exit_json(**result)
 
-    if module.params['state'] == 'present':
-        for domain in environment['domains']:
-            if domain['name'] == module.params['hostname']:
-                module.exit_json(**result)
-
-        result['result'] = client.add_domain(module.params['environment'], module.params['hostname'])
-        result['changed'] = True
+    try:
+        applied = apply_domains(client, module.params['environment'], plan, module.params['max_concurrency'])
+    except ApiError as e:
+        module.fail_json(msg=str(e), **result)
 
-    elif module.params['state'] == 'absent':
-        for domain in environment['domains']:
-            if domain['name'] == module.params['hostname']:
-                client.delete_domain(module.params['environment'], module.params['hostname'])
-                result['result'] = module.params['hostname']
-                result['changed'] = True
+    result['result'] = domain_result(plan, hostname, state, applied)
 
     module.exit_json(**result)
 
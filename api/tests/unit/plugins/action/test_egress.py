@@ -0,0 +1,63 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+from ansible.playbook.play_context import PlayContext
+from ansible.playbook.task import Task
+from ansible_collections.section.api.plugins.action.egress import ActionModule
+
+
+class FakeClient:
+    """Records set_egress calls against an egress configuration."""
+
+    def __init__(self, egress):
+        self.egress = egress
+        self.sets = []
+
+    def list_egress(self, name):
+        return self.egress
+
+    def set_egress(self, name, origins, remove_headers=list()):
+        self.sets.append((name, origins, remove_headers))
+
+
+def update(client, egress, egress_name='default'):
+    action = ActionModule(Task(), None, PlayContext(), None, None, None)
+    args = {'environment': 'Develop', 'egress': egress, 'egress_name': egress_name, 'remove_headers': None}
+    return action.update(client, args, {})
+
+
+def configuration():
+    return {
+        'remove_request_headers': ['section-io-id'],
+        'origins': {
+            'default': {'address': 'origin.example.com'},
+            'assets': {'address': 'assets.example.com', 'host_header': 'assets'},
+        },
+    }
+
+
+def test_update_adds_a_new_origin_name():
+    client = FakeClient(configuration())
+
+    assert update(client, 'api.example.com', egress_name='api') == {'changed': True}
+    assert client.sets[0][1]['api'] == {'address': 'api.example.com'}
+
+
+def test_update_keeps_the_origins_it_does_not_name():
+    client = FakeClient(configuration())
+
+    update(client, 'new.example.com')
+
+    name, origins, remove_headers = client.sets[0]
+    assert origins == {
+        'default': {'address': 'new.example.com'},
+        'assets': {'address': 'assets.example.com', 'host_header': 'assets'},
+    }
+    assert remove_headers == ['section-io-id']
+
+
+def test_update_skips_an_origin_already_set():
+    client = FakeClient(configuration())
+
+    assert update(client, 'assets.example.com', egress_name='assets') == {'skipped': True}
+    assert client.sets == []
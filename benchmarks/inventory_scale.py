@@ -0,0 +1,168 @@
+"""Measure how the applications inventory plugin scales with host count.
+
+Builds a synthetic account tree in memory (no API requests) and times
+adding it to an inventory, comparing the per-host group and hostvar calls
+the plugin used to make with its current compact model and one-pass emit.
+
+    python benchmarks/inventory_scale.py --accounts 50 --applications 100 --environments 10
+
+The defaults give 50,000 environment hosts. Parse time is the median of
+--repeat runs and memory is the tracemalloc peak of a separate run.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+
+import argparse
+import gc
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from run import collections_path, load_collections  # noqa: E402
+
+
+def synthetic_accounts(accounts, applications, environments, domains):
+    """Build an account tree shaped like the one the plugin caches."""
+
+    tree = []
+
+    for sid in range(1, accounts + 1):
+        apps = []
+        for index in range(applications):
+            app_id = sid * 1000 + index
+            apps.append({
+                'id': app_id,
+                'name': f'app{sid}_{index}',
+                'environments': [
+                    {
+                        'name': f'env{env}',
+                        'domains': [f'www{number}.app{app_id}.example.com' for number in range(domains)],
+                    }
+                    for env in range(environments)
+                ],
+            })
+        tree.append({'id': sid, 'name': f'Account {sid}', 'applications': apps})
+
+    return tree
+
+
+def legacy_populate(inventory, accounts):
+    """Add an account tree the way the plugin did before the compact model."""
+
+    for account in accounts:
+        sid = account['id']
+
+        inventory.add_group(account['name'])
+
+        for application in account['applications']:
+            app_id = application['id']
+            app_name = application['name']
+
+            inventory.add_group(app_name)
+
+            for environment in application['environments']:
+                env_name = environment['name']
+                host_name = f'{sid}-{app_name}-{env_name}'
+
+                inventory.add_group(env_name)
+
+                inventory.add_host(host_name)
+                inventory.add_child(env_name, host_name)
+                inventory.add_child(app_name, host_name)
+                inventory.add_child(account['name'], host_name)
+
+                inventory.set_variable(host_name, 'branch', env_name)
+                inventory.set_variable(host_name, 'id', app_id)
+                inventory.set_variable(host_name, 'name', app_name)
+                inventory.set_variable(host_name, 'section_id', sid)
+
+                if 'domains' in environment:
+                    inventory.set_variable(host_name, 'domains', list(map(lambda domain: domain, environment['domains'])))
+
+
+def compact_populate(inventory, accounts):
+    from ansible.plugins.loader import inventory_loader
+    from ansible_collections.section.api.plugins.module_utils.inventory_model import InventoryModel
+
+    plugin = inventory_loader.get('section.api.applications')
+    plugin.inventory = inventory
+    plugin.populate(InventoryModel().add_accounts(accounts))
+
+
+def measure(populate, accounts, repeat):
+    from ansible.inventory.data import InventoryData
+
+    times = []
+    for _ in range(repeat):
+        inventory = InventoryData()
+        gc.collect()
+        start = time.perf_counter()
+        populate(inventory, accounts)
+        times.append(time.perf_counter() - start)
+        hosts = len(inventory.hosts)
+        del inventory
+
+    gc.collect()
+    tracemalloc.start()
+    inventory = InventoryData()
+    populate(inventory, accounts)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'hosts': hosts,
+        'parse_time': statistics.median(times),
+        'parse_time_min': min(times),
+        'peak_memory_kb': peak // 1024,
+        'retained_memory_kb': retained // 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--accounts', type=int, default=50)
+    parser.add_argument('--applications', type=int, default=100)
+    parser.add_argument('--environments', type=int, default=10)
+    parser.add_argument('--domains', type=int, default=2, help='Domains per environment.')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout.')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='section-inventory-scale-')
+
+    try:
+        load_collections(collections_path(workdir))
+        accounts = synthetic_accounts(args.accounts, args.applications, args.environments, args.domains)
+
+        report = {
+            'parameters': vars(args),
+            'legacy': measure(legacy_populate, accounts, args.repeat),
+            'compact': measure(compact_populate, accounts, args.repeat),
+        }
+    finally:
+        shutil.rmtree(workdir)
+
+    for name in ('legacy', 'compact'):
+        print(f"{name}: {report[name]['hosts']} hosts, {report[name]['parse_time']:.3f}s, "
+              f"peak {report[name]['peak_memory_kb']} KiB", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output + '\n')
+    else:
+        print(output)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,287 @@
+"""A local fake of the Section aperture API for benchmarks.
+
+Serves N accounts x M applications x K environments with configurable
+latency, jitter and error rate, and counts the requests it receives.
+GET responses carry an ETag and are answered with 304 when it matches.
+
+    python benchmarks/mock_api.py --accounts 40 --applications 10 --environments 5 --latency 0.05
+"""
+
+from __future__ import (absolute_import, division, print_function)
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+API_PREFIX = '/api/v1'
+
+ROUTES = []
+
+
+def route(method, pattern):
+    def register(func):
+        ROUTES.append((method, re.compile(f'^{pattern}$'), func))
+        return func
+    return register
+
+
+class Dataset:
+    """The fake accounts, applications and environments."""
+
+    def __init__(self, accounts=3, applications=4, environments=3):
+        self.accounts = accounts
+        self.applications = applications
+        self.environments = environments
+        self.lock = threading.Lock()
+        self.created = {}
+        self.domains = {}
+        self.egress = {}
+        self.bans = {}
+
+    def has_application(self, account, application):
+        return 1 <= account <= self.accounts and 0 <= application - account * 1000 < self.applications
+
+    def environment_names(self, account, application):
+        names = [f'env{index}' for index in range(self.environments)]
+        return names + self.created.get((account, application), [])
+
+    def environment(self, account, application, name):
+        key = (account, application, name)
+        with self.lock:
+            domains = self.domains.setdefault(key, [f'{name}.app{application}.example.com'])
+            return {
+                'id': abs(hash(key)) % 100000,
+                'environment_name': name,
+                'domains': [{'name': domain} for domain in domains],
+            }
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Buffer writes so headers and body leave in one segment.
+    wbufsize = -1
+
+    def log_message(self, format, *args):
+        pass
+
+    def respond(self, status, body, headers=None):
+        data = json.dumps(body).encode('utf-8')
+        headers = dict(headers or {})
+
+        if status == 200 and self.command == 'GET':
+            headers['ETag'] = '"%s"' % hashlib.sha1(data).hexdigest()
+
+            if self.headers.get('If-None-Match') == headers['ETag']:
+                with self.server.lock:
+                    self.server.not_modified += 1
+                self.send_response(304)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                return
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def handle_method(self, method):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+
+        with server.lock:
+            server.requests += 1
+            server.requests_by_method[method] = server.requests_by_method.get(method, 0) + 1
+
+        delay = server.latency + random.uniform(0, server.jitter)
+        if delay:
+            time.sleep(delay)
+
+        if server.error_rate and random.random() < server.error_rate:
+            return self.respond(503, {'message': 'Service unavailable'}, {'Retry-After': '0'})
+
+        url = urlparse(self.path)
+        path = url.path[len(API_PREFIX):] if url.path.startswith(API_PREFIX) else url.path
+        path = path.rstrip('/') or '/'
+        query = dict(parse_qsl(url.query))
+
+        for route_method, pattern, func in ROUTES:
+            match = pattern.match(path)
+            if route_method == method and match:
+                payload = json.loads(body) if body.strip() else {}
+                status, response = func(server.dataset, payload, query, *match.groups())
+                return self.respond(status, response)
+
+        self.respond(404, {'message': 'Not found'})
+
+    def do_GET(self):
+        self.handle_method('GET')
+
+    def do_POST(self):
+        self.handle_method('POST')
+
+    def do_DELETE(self):
+        self.handle_method('DELETE')
+
+
+ENV = r'/account/(\d+)/application/(\d+)/environment'
+
+
+@route('GET', r'/account')
+def list_accounts(data, payload, query):
+    return 200, [{'id': sid, 'account_name': f'Account {sid}'} for sid in range(1, data.accounts + 1)]
+
+
+@route('GET', r'/account/(\d+)')
+def get_account(data, payload, query, sid):
+    if not 1 <= int(sid) <= data.accounts:
+        return 404, {'message': 'Not found'}
+    return 200, {'id': int(sid), 'account_name': f'Account {sid}'}
+
+
+@route('GET', r'/account/(\d+)/application')
+def list_applications(data, payload, query, sid):
+    sid = int(sid)
+    return 200, [
+        {'id': sid * 1000 + index, 'application_name': f'app{sid}_{index}'}
+        for index in range(data.applications)
+    ]
+
+
+@route('GET', ENV)
+def list_environments(data, payload, query, sid, app_id):
+    sid, app_id = int(sid), int(app_id)
+    if not data.has_application(sid, app_id):
+        return 404, {'message': 'Not found'}
+    return 200, [data.environment(sid, app_id, name) for name in data.environment_names(sid, app_id)]
+
+
+@route('POST', ENV)
+def create_environment(data, payload, query, sid, app_id):
+    sid, app_id = int(sid), int(app_id)
+    with data.lock:
+        data.created.setdefault((sid, app_id), []).append(payload['name'])
+        # A created environment starts with the domain it was requested with.
+        data.domains[(sid, app_id, payload['name'])] = [payload['domain_name']]
+    return 200, data.environment(sid, app_id, payload['name'])
+
+
+@route('GET', ENV + r'/([^/]+)')
+def get_environment(data, payload, query, sid, app_id, name):
+    sid, app_id = int(sid), int(app_id)
+    if name not in data.environment_names(sid, app_id):
+        return 404, {'message': 'Not found'}
+    return 200, data.environment(sid, app_id, name)
+
+
+@route('POST', ENV + r'/([^/]+)/domain/([^/]+)')
+def add_domain(data, payload, query, sid, app_id, name, hostname):
+    environment = data.environment(int(sid), int(app_id), name)
+    with data.lock:
+        data.domains[(int(sid), int(app_id), name)].append(hostname)
+    return 200, {'name': hostname, 'environment': environment['environment_name']}
+
+
+@route('DELETE', ENV + r'/([^/]+)/domain/([^/]+)')
+def delete_domain(data, payload, query, sid, app_id, name, hostname):
+    key = (int(sid), int(app_id), name)
+    with data.lock:
+        if hostname in data.domains.get(key, []):
+            data.domains[key].remove(hostname)
+    return 200, {}
+
+
+@route('GET', ENV + r'/([^/]+)/egress')
+def get_egress(data, payload, query, sid, app_id, name):
+    default = {'remove_request_headers': ['section-io-id'], 'origins': {'default': {'address': 'origin.example.com'}}}
+    return 200, data.egress.get((int(sid), int(app_id), name), default)
+
+
+@route('POST', ENV + r'/([^/]+)/egress')
+def update_egress(data, payload, query, sid, app_id, name):
+    data.egress[(int(sid), int(app_id), name)] = payload
+    return 200, payload
+
+
+@route('GET', ENV + r'/([^/]+)/proxy/([^/]+)/configuration')
+def get_proxy_configuration(data, payload, query, sid, app_id, name, proxy):
+    return 200, {'proxy': proxy, 'image': f'{proxy}:latest'}
+
+
+@route('GET', ENV + r'/([^/]+)/proxy/([^/]+)/state')
+def get_proxy_state(data, payload, query, sid, app_id, name, proxy):
+    pending = data.bans.pop((int(sid), int(app_id), name, proxy), [])
+    return 200, [{'hostname': f'edge{index}', 'banQueue': pending} for index in range(2)]
+
+
+@route('POST', ENV + r'/([^/]+)/proxy/([^/]+)/state')
+def ban(data, payload, query, sid, app_id, name, proxy):
+    data.bans[(int(sid), int(app_id), name, proxy)] = [query.get('banExpression')]
+    return 200, {'banExpression': query.get('banExpression')}
+
+
+class MockApiServer(ThreadingHTTPServer):
+    """The fake API, serving a Dataset with simulated latency and errors."""
+
+    daemon_threads = True
+    # Accept bursts of hundreds of concurrent connections.
+    request_queue_size = 1024
+
+    def __init__(self, dataset, latency=0.0, jitter=0.0, error_rate=0.0, host='127.0.0.1', port=0):
+        ThreadingHTTPServer.__init__(self, (host, port), Handler)
+        self.dataset = dataset
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.requests_by_method = {}
+        self.not_modified = 0
+
+    @property
+    def endpoint(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}{API_PREFIX}'
+
+    def reset_counters(self):
+        with self.lock:
+            self.requests = 0
+            self.requests_by_method = {}
+            self.not_modified = 0
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--accounts', type=int, default=3)
+    parser.add_argument('--applications', type=int, default=4)
+    parser.add_argument('--environments', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    dataset = Dataset(args.accounts, args.applications, args.environments)
+    server = MockApiServer(dataset, args.latency, args.jitter, args.error_rate, args.host, args.port)
+    print(f'Serving the mock Section API on {server.endpoint}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
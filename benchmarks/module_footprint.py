@@ -0,0 +1,185 @@
+"""Measure the AnsiballZ payload and import footprint of the collection's modules.
+
+Builds the payload of each module the way ansible-core does before sending
+it to a target, then imports the module from the payload alone in fresh
+interpreters. Each module is compared with a variant importing the
+controller-side clients (env_client and proxy_client) instead of
+module_client.
+
+The domain and ban action plugins shadow these modules in playbook tasks,
+which never execute them, so this measures the modules run on their own.
+
+    python benchmarks/module_footprint.py --repeat 10
+
+Module imports run with python -S, so like a target without ansible
+installed only the payload is importable, a variant that needs controller
+code fails there. The clients themselves are also timed on their own, with
+the installed ansible-core.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+
+import argparse
+import base64
+import io
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from run import COLLECTION, load_collections  # noqa: E402
+
+MODULE_UTILS = 'ansible_collections.section.api.plugins.module_utils'
+
+# The import each module uses, the controller-side import it is compared
+# with, and the client module each of them loads.
+MODULES = {
+    'domain': ('module_client import ApiError, ModuleEnvClient as ApiClient',
+               'env_client import EnvClient as ApiClient\nApiError = Exception',
+               'module_client', 'env_client'),
+    'ban': ('module_client import ApiError, ModuleProxyClient as ApiClient',
+            'proxy_client import ProxyClient as ApiClient\nApiError = Exception',
+            'module_client', 'proxy_client'),
+}
+
+IMPORT_SCRIPT = '''
+import sys, time
+sys.path.insert(0, sys.argv[1])
+start = time.perf_counter()
+import %s
+elapsed = time.perf_counter() - start
+print('{"import_time": %%f, "modules": %%d}' %% (elapsed, len(sys.modules)))
+'''
+
+
+def copy_collection(workdir):
+    """Copy the collection under workdir, so variants can be added to it."""
+
+    shutil.copytree(COLLECTION, os.path.join(workdir, 'ansible_collections', 'section', 'api'),
+                    ignore=shutil.ignore_patterns('__pycache__'))
+    return workdir
+
+
+def build_payload(name, path):
+    """Build a module's AnsiballZ payload, return its size and zip data."""
+
+    from ansible.executor import module_common
+    from ansible.parsing.dataloader import DataLoader
+    from ansible.template import Templar
+
+    built = module_common.modify_module(
+        module_name=f'section.api.{name}',
+        module_path=path,
+        module_args={},
+        templar=Templar(loader=DataLoader()),
+        task_vars={'ansible_python_interpreter': sys.executable},
+    )
+
+    zip_data = re.search(rb"zip_data='([^']+)'", built.b_module_data).group(1)
+
+    return len(built.b_module_data), base64.b64decode(zip_data)
+
+
+def time_import(path, fqn, repeat, isolated):
+    """Median time to import fqn with path first on sys.path, in fresh interpreters."""
+
+    flags = ['-S'] if isolated else []
+    runs = []
+
+    for _ in range(repeat):
+        process = subprocess.run([sys.executable] + flags + ['-c', IMPORT_SCRIPT % fqn, path],
+                                 capture_output=True, text=True)
+        if process.returncode != 0:
+            return {'error': process.stderr.strip().splitlines()[-1]}
+        runs.append(json.loads(process.stdout))
+
+    return {
+        'import_time': statistics.median(run['import_time'] for run in runs),
+        'modules': runs[0]['modules'],
+    }
+
+
+def measure(name, path, client, workdir, repeat):
+    size, zip_bytes = build_payload(name, path)
+
+    names = zipfile.ZipFile(io.BytesIO(zip_bytes)).namelist()
+    zip_path = os.path.join(workdir, f'{os.path.basename(path)}.zip')
+    with open(zip_path, 'wb') as handle:
+        handle.write(zip_bytes)
+
+    fqn = 'ansible_collections.section.api.plugins.modules.' + os.path.splitext(os.path.basename(path))[0]
+
+    return {
+        'payload_bytes': size,
+        'payload_files': len(names),
+        'collection_files': sorted(
+            os.path.basename(name) for name in names if name.startswith('ansible_collections/section/api/plugins/module_utils/')
+        ),
+        'target': time_import(zip_path, fqn, repeat, isolated=True),
+        'client': time_import(workdir, f'{MODULE_UTILS}.{client}', repeat, isolated=False),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='Interpreters started per import measurement.')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout.')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='section-module-footprint-')
+    report = {}
+
+    try:
+        path = copy_collection(workdir)
+        load_collections(path)
+        modules_dir = os.path.join(path, 'ansible_collections', 'section', 'api', 'plugins', 'modules')
+
+        for name, (module_import, controller_import, module_client, controller_client) in MODULES.items():
+            source_path = os.path.join(modules_dir, f'{name}.py')
+
+            with open(source_path) as handle:
+                source = handle.read()
+
+            variant_path = os.path.join(modules_dir, f'{name}_controller_client.py')
+            with open(variant_path, 'w') as handle:
+                handle.write(source.replace(module_import, controller_import))
+
+            report[name] = {
+                'module_client': measure(name, source_path, module_client, workdir, args.repeat),
+                'controller_client': measure(name, variant_path, controller_client, workdir, args.repeat),
+            }
+    finally:
+        shutil.rmtree(workdir)
+
+    for name, variants in report.items():
+        for variant, result in variants.items():
+            timings = []
+            for label in ('target', 'client'):
+                timing = result[label]
+                if 'import_time' in timing:
+                    timings.append(f"{label} import {timing['import_time'] * 1000:.1f}ms, {timing['modules']} modules")
+                else:
+                    timings.append(f"{label} import {timing['error']}")
+            print(f"{name} ({variant}): {result['payload_bytes']} bytes, {result['payload_files']} files, " + ', '.join(timings),
+                  file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output + '\n')
+    else:
+        print(output)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,328 @@
+"""End to end benchmarks of the section.api plugins against a mock API.
+
+Starts the mock API from mock_api.py, runs each scenario in its own
+Python process and writes the request count, wall time and peak RSS of
+every scenario to a JSON report.
+
+    python benchmarks/run.py --accounts 40 --applications 10 --environments 5 \\
+        --latency 0.05 --jitter 0.01 --output report.json
+
+Pass --baseline with an earlier report to fail when a scenario got slower
+or made more requests than the baseline allows.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+COLLECTION = os.path.join(os.path.dirname(HERE), 'api')
+
+SCENARIOS = ('inventory', 'lookup', 'async_get', 'egress', 'domain', 'domain_action')
+
+ACCOUNT = 1
+APPLICATION = 1000
+
+
+def collections_path(workdir):
+    """Lay the collection out as ansible_collections/section/api under workdir."""
+
+    namespace = os.path.join(workdir, 'ansible_collections', 'section')
+    os.makedirs(namespace)
+    os.symlink(COLLECTION, os.path.join(namespace, 'api'))
+    return workdir
+
+
+def load_collections(path):
+    try:
+        from ansible.plugins.loader import init_plugin_loader
+    except ImportError:
+        from ansible.utils.collection_loader._collection_finder import _AnsibleCollectionFinder
+        _AnsibleCollectionFinder(paths=[path])._install()
+    else:
+        init_plugin_loader([path])
+
+
+def peak_rss_kb():
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere.
+    return usage // 1024 if platform.system() == 'Darwin' else usage
+
+
+def credentials():
+    return {'section_username': 'benchmark', 'section_password': 'benchmark'}
+
+
+def prepare_inventory(args, workdir):
+    from ansible.inventory.manager import InventoryManager
+    from ansible.parsing.dataloader import DataLoader
+
+    source = os.path.join(workdir, 'section.yml')
+    with open(source, 'w') as handle:
+        json.dump({
+            'plugin': 'section.api.applications',
+            'max_concurrency': args.max_concurrency,
+            'connections': [{'username': 'benchmark', 'password': 'benchmark'}],
+        }, handle)
+
+    def run():
+        inventory = InventoryManager(loader=DataLoader(), sources=[source])
+        return {'hosts': len(inventory.list_hosts())}
+
+    return run
+
+
+def prepare_lookup(args, workdir):
+    from ansible.plugins.loader import lookup_loader
+
+    lookup = lookup_loader.get('section.api.environment')
+    terms = [f'env{index}' for index in range(args.environments)]
+
+    def run():
+        results = lookup.run(terms, {}, section_account=ACCOUNT, section_application=APPLICATION, **credentials())
+        return {'environments': len(results)}
+
+    return run
+
+
+def prepare_async_get(args, workdir):
+    from ansible_collections.section.api.plugins.module_utils.async_client import AsyncEnvClient, gather
+
+    client = AsyncEnvClient(ACCOUNT, APPLICATION, 'benchmark', 'benchmark')
+    names = [f'env{index}' for index in range(args.environments)]
+
+    def run():
+        results = gather(client.get(name) for name in names)
+        return {'environments': len(results)}
+
+    return run
+
+
+def action_runner(name, task_args):
+    """Build a function that runs an action plugin once per environment."""
+
+    from ansible.parsing.dataloader import DataLoader
+    from ansible.playbook.play_context import PlayContext
+    from ansible.playbook.task import Task
+    from ansible.plugins.loader import action_loader, connection_loader
+    from ansible.template import Templar
+
+    loader = DataLoader()
+    play_context = PlayContext()
+    connection = connection_loader.get('local', play_context)
+    task_vars = dict(credentials(), section_account=ACCOUNT, section_application=APPLICATION)
+
+    def run(environments):
+        changed = 0
+        for index in range(environments):
+            task = Task()
+            task.action = name
+            task.args = task_args(index)
+            action = action_loader.get(name, task, connection, play_context, loader, Templar(loader=loader), None)
+            changed += bool(action.run(task_vars=dict(task_vars)).get('changed'))
+        return {'changed': changed}
+
+    return run
+
+
+def prepare_egress(args, workdir):
+    run = action_runner('section.api.egress', lambda index: {
+        'environment': f'env{index}',
+        'egress': f'origin{index}.example.net',
+    })
+    return lambda: run(args.environments)
+
+
+def prepare_domain_action(args, workdir):
+    run = action_runner('section.api.domain', lambda index: {
+        'environment': f'env{index}',
+        'hostname': f'bench{index}.example.net',
+    })
+    return lambda: run(args.environments)
+
+
+def prepare_domain(args, workdir):
+    import ansible.module_utils.basic as basic
+    from ansible_collections.section.api.plugins.modules import domain
+
+    def run():
+        results = []
+        for index in range(args.environments):
+            module_args = dict(credentials(), section_account=ACCOUNT, section_application=APPLICATION,
+                               environment=f'env{index}', hostname=f'bench{index}.example.net')
+            basic._ANSIBLE_ARGS = json.dumps({'ANSIBLE_MODULE_ARGS': module_args}).encode('utf-8')
+            if hasattr(basic, '_ANSIBLE_PROFILE'):
+                basic._ANSIBLE_PROFILE = 'legacy'
+
+            output = io.StringIO()
+            try:
+                with redirect_stdout(output):
+                    domain.main()
+            except SystemExit:
+                pass
+            results.append(json.loads(output.getvalue()))
+
+        return {'changed': sum(1 for result in results if result.get('changed'))}
+
+    return run
+
+
+def child(args):
+    """Run one scenario in this process and print its measurements as JSON."""
+
+    load_collections(args.collections_path)
+
+    prepare = globals()[f'prepare_{args.scenario}']
+    run = prepare(args, args.workdir)
+
+    rss_before = peak_rss_kb()
+    start = time.perf_counter()
+    details = run()
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        'wall_time': elapsed,
+        'peak_rss_kb': peak_rss_kb(),
+        'peak_rss_before_kb': rss_before,
+        'details': details,
+    }))
+
+
+def measure(args, server, scenario, workdir, path):
+    env = dict(os.environ)
+    env['SECTION_IO_ENDPOINT'] = server.endpoint
+    env['ANSIBLE_COLLECTIONS_PATH'] = path
+
+    command = [
+        sys.executable, os.path.abspath(__file__), '--child', scenario,
+        '--collections-path', path, '--workdir', workdir,
+        '--environments', str(args.environments), '--max-concurrency', str(args.max_concurrency),
+    ]
+
+    server.reset_counters()
+    output = subprocess.check_output(command, env=env)
+    result = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+    result['requests'] = server.requests
+    result['requests_by_method'] = dict(server.requests_by_method)
+    result['not_modified'] = server.not_modified
+    return result
+
+
+def summarise(runs):
+    return {
+        'wall_time': statistics.median(run['wall_time'] for run in runs),
+        'wall_time_min': min(run['wall_time'] for run in runs),
+        'requests': max(run['requests'] for run in runs),
+        'peak_rss_kb': max(run['peak_rss_kb'] for run in runs),
+        'runs': runs,
+    }
+
+
+def regressions(report, baseline, tolerance):
+    """List the scenarios that are slower or chattier than the baseline allows."""
+
+    failures = []
+
+    for scenario, result in report['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(scenario)
+        if not previous:
+            continue
+
+        if result['wall_time'] > previous['wall_time'] * (1 + tolerance):
+            failures.append(f"{scenario}: wall time {result['wall_time']:.3f}s > {previous['wall_time']:.3f}s")
+
+        if result['requests'] > previous['requests']:
+            failures.append(f"{scenario}: {result['requests']} requests > {previous['requests']}")
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                        help='Scenario to run, may be repeated. Defaults to all of them.')
+    parser.add_argument('--accounts', type=int, default=3)
+    parser.add_argument('--applications', type=int, default=4)
+    parser.add_argument('--environments', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds added to every response.')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Up to this many extra seconds per response.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with a 503.')
+    parser.add_argument('--max-concurrency', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout.')
+    parser.add_argument('--baseline', help='A previous report to compare against.')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed wall time increase over the baseline, as a fraction.')
+    parser.add_argument('--child', choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument('--collections-path', help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        args.scenario = args.child
+        return child(args)
+
+    sys.path.insert(0, HERE)
+    from mock_api import Dataset, MockApiServer
+
+    dataset = Dataset(args.accounts, args.applications, args.environments)
+    server = MockApiServer(dataset, args.latency, args.jitter, args.error_rate).start()
+    workdir = tempfile.mkdtemp(prefix='section-benchmark-')
+
+    try:
+        path = collections_path(workdir)
+        report = {
+            'parameters': {
+                'accounts': args.accounts,
+                'applications': args.applications,
+                'environments': args.environments,
+                'latency': args.latency,
+                'jitter': args.jitter,
+                'error_rate': args.error_rate,
+                'max_concurrency': args.max_concurrency,
+                'repeat': args.repeat,
+            },
+            'python': platform.python_version(),
+            'scenarios': {},
+        }
+
+        for scenario in args.scenario or SCENARIOS:
+            runs = [measure(args, server, scenario, workdir, path) for _ in range(args.repeat)]
+            report['scenarios'][scenario] = summarise(runs)
+            print(f"{scenario}: {report['scenarios'][scenario]['wall_time']:.3f}s, "
+                  f"{report['scenarios'][scenario]['requests']} requests", file=sys.stderr)
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            failures = regressions(report, json.load(handle), args.tolerance)
+        for failure in failures:
+            print(f'Regression: {failure}', file=sys.stderr)
+        return 1 if failures else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())